@@ -1,20 +1,32 @@
-def evaluate_accuracy(subgraphs, positive_graphs, negative_graphs):
+import numpy as np
+
+from containment import ContainmentIndex
+
+
+def _score(matches, n_positive):
+    # matches: graph x pattern containment, positive graphs first
+    positive, negative = matches[:n_positive], matches[n_positive:]
+    correct_pos = positive.any(axis=1).sum()
+    correct_neg = (~negative).any(axis=1).sum()
+    return float((correct_pos + correct_neg) / len(matches))
+
+
+def evaluate_accuracy(subgraphs, positive_graphs, negative_graphs, directed=None):
     if not positive_graphs and not negative_graphs:
         return 0.0
 
-    correct_pos = 0
-    for g in positive_graphs:
-        for sub in subgraphs:
-            if all(g.has_edge(*e) for e in sub.edges()):
-                correct_pos += 1
-                break
-
-    correct_neg = 0
-    for g in negative_graphs:
-        for sub in subgraphs:
-            if not all(g.has_edge(*e) for e in sub.edges()):
-                correct_neg += 1
-                break
-
-    total = len(positive_graphs) + len(negative_graphs)
-    return (correct_pos + correct_neg) / total
\ No newline at end of file
+    # a positive graph is correct if it contains some subgraph, a negative one
+    # if it misses some subgraph; edges of undirected graphs match either
+    # orientation of a pattern edge (directed=None follows the graphs)
+    index = ContainmentIndex.from_graphs(list(positive_graphs) + list(negative_graphs), directed)
+    return _score(index.contains(subgraphs), len(positive_graphs))
+
+
+def evaluate_accuracy_from_corpus(subgraphs, corpus, positive_groups, negative_groups, directed=True):
+    positive_groups = corpus.group_ids(positive_groups)
+    negative_groups = corpus.group_ids(negative_groups)
+    if len(positive_groups) == 0 and len(negative_groups) == 0:
+        return 0.0
+
+    index = ContainmentIndex.from_corpus(corpus, np.concatenate([positive_groups, negative_groups]), directed)
+    return _score(index.contains(subgraphs), len(positive_groups))
@@ -1,28 +1,134 @@
-import networkx as nx
-def extract_action_patterns(graphs, harmful_edges, max_hops=3):
-    patterns = []
-    
+import numpy as np
+
+import instrument
+from support import undirected_keys
+
+
+def _bounded_bfs(adj, source, max_hops):
+    # BFS parent pointers from source, at most max_hops levels deep
+    parent = {source: None}
+    frontier = [source]
+    for _ in range(max_hops):
+        next_frontier = []
+        for u in frontier:
+            for v in adj.get(u, ()):
+                if v not in parent:
+                    parent[v] = u
+                    next_frontier.append(v)
+        frontier = next_frontier
+        if not frontier:
+            break
+    return parent
+
+
+def _paths_through(parent, src, dst):
+    # every shortest path from src whose first hop is the edge src -> dst
+    # (a simple path starting at src can only use the edge as its first step)
+    for target in parent:
+        if target == src:
+            continue
+        path = [target]
+        while parent[path[-1]] is not None:
+            path.append(parent[path[-1]])
+        path.reverse()
+        if path[1] == dst:
+            yield path
+
+
+def _graph_patterns(adj, edges_by_source, has_edge, max_hops):
+    # one bounded BFS per source node, shared by every harmful edge leaving it
+    for src, dsts in edges_by_source.items():
+        if src not in adj:
+            continue
+        parent = None
+        for dst in dsts:
+            if not has_edge(src, dst):
+                continue
+            if parent is None:
+                parent = _bounded_bfs(adj, src, max_hops)
+                instrument.count("bfs_calls")
+            added = False
+            for path in _paths_through(parent, src, dst):
+                added = True
+                yield path
+            # if the edge wasn't added in a path, include it directly
+            if not added:
+                yield [src, dst]
+
+
+def _by_source(harmful_edges, directed=True):
+    edges_by_source = {}
+    for src, dst in harmful_edges:
+        edges_by_source.setdefault(src, []).append(dst)
+        if not directed and src != dst:
+            edges_by_source.setdefault(dst, []).append(src)
+    return edges_by_source
+
+
+def iter_action_patterns(graphs, harmful_edges, max_hops=3, directed=True):
+    """
+    Stream the distinct action patterns of extract_action_patterns() one at a time.
+
+    Parameters:
+        graphs: list of nx.DiGraph — patient graphs (usually the dead class)
+        harmful_edges: iterable of (src, dst) — edges to explain
+        max_hops: int — longest path, in edges, starting at a harmful edge's source
+        directed: bool — False walks the graphs and harmful edges in both orientations
+                         (what undirected nx.Graph patients always do)
+
+    Yields:
+        list — path of codes through a harmful edge, each distinct path once
+    """
+    edges_by_source = _by_source(harmful_edges, directed)
+    seen = set()
     for g in graphs:
-        for edge in harmful_edges:
-            if g.has_edge(*edge):
-                src, dst = edge
-                added = False
-                for target in g.nodes():
-                    if target != src:
-                        try:
-                            path = nx.shortest_path(g, source=src, target=target)
-                            if len(path) <= max_hops + 1:
-                                edge_in_path = any((path[i], path[i+1]) == edge or (path[i+1], path[i]) == edge 
-                                                   for i in range(len(path)-1))
-                                if edge_in_path:
-                                    patterns.append(path)
-                                    added = True
-                        except nx.NetworkXNoPath:
-                            continue
-                # if the edge wasn't added in a path, include it directly
-                if not added:
-                    patterns.append([src, dst])
-
-    # Remove duplicates and return
-    unique_patterns = [list(x) for x in set(tuple(p) for p in patterns)]
-    return unique_patterns
\ No newline at end of file
+        if not directed and g.is_directed():
+            g = g.to_undirected(as_view=True)
+        for path in _graph_patterns(g.adj, edges_by_source, g.has_edge, max_hops):
+            key = tuple(path)
+            if key not in seen:
+                seen.add(key)
+                yield path
+
+
+def extract_action_patterns(graphs, harmful_edges, max_hops=3, directed=True):
+    return list(iter_action_patterns(graphs, harmful_edges, max_hops, directed))
+
+
+def iter_action_patterns_from_corpus(corpus, groups, harmful_edges, max_hops=3, directed=True):
+    # only graphs that hold at least one harmful edge can yield a pattern
+    harmful = corpus.encode_edges(harmful_edges)
+    harmful = np.unique(harmful[harmful >= 0])
+    pos, owner = corpus.transition_index(groups)
+    keys = corpus.keys[pos]
+    hit = np.isin(keys if directed else undirected_keys(keys, corpus.n_codes),
+                  harmful if directed else undirected_keys(harmful, corpus.n_codes))
+    candidates = np.unique(owner[hit])
+    instrument.count("graphs", len(candidates))
+
+    n = corpus.n_codes
+    edges_by_source = _by_source(zip((harmful // n).tolist(), (harmful % n).tolist()), directed)
+    seen = set()
+    for i in candidates:
+        lo, hi = corpus.offsets[i], corpus.offsets[i + 1]
+        # adjacency in first-seen order, as nx.DiGraph.add_edges_from would build it
+        adj = {}
+        for u, v in zip(corpus.src[lo:hi].tolist(), corpus.dst[lo:hi].tolist()):
+            succ = adj.setdefault(u, {})
+            succ[v] = None
+            if directed:
+                adj.setdefault(v, {})
+            else:
+                adj.setdefault(v, {})[u] = None
+        def has_edge(u, v, adj=adj):
+            return v in adj[u]
+
+        for path in _graph_patterns(adj, edges_by_source, has_edge, max_hops):
+            key = tuple(path)
+            if key not in seen:
+                seen.add(key)
+                yield list(corpus.codes[path])
+
+
+def extract_action_patterns_from_corpus(corpus, groups, harmful_edges, max_hops=3, directed=True):
+    return list(iter_action_patterns_from_corpus(corpus, groups, harmful_edges, max_hops, directed))
@@ -0,0 +1,87 @@
+import logging
+
+import numpy as np
+
+from approx import find_discriminative_graph_approx, find_harmful_edges_approx
+from discgraph import find_discriminative_graph_from_corpus
+from accuracy import evaluate_accuracy_from_corpus
+from features import PatternFeatures, PatternScorer
+from harmfulEdges import find_harmful_edges_from_corpus
+from actionAvoid import extract_action_patterns_from_corpus
+from instrument import count, stage
+
+# independent units of the pipeline; each takes the corpus plus one picklable
+# unit description and returns plain picklable results so it can run in a pool worker.
+# `directed` and `weighted` carry the pipeline's edge semantics (see find_discriminative_graph);
+# every stage but the DSM graphs themselves counts directed edges unless directed is False.
+# `approximate` (None, or ApproximateSupport settings) switches support counting to approx.py
+
+log = logging.getLogger(__name__)
+
+
+def phase_dsm(corpus, unit):
+    phase, alpha, beta, directed, weighted, approximate = unit
+    R_alive_p = corpus.select(phase=phase, mortality=0)
+    R_dead_p = corpus.select(phase=phase, mortality=1)
+    with stage("dsm", phase=phase):
+        if approximate is not None:
+            dg, avoid, report = find_discriminative_graph_approx(corpus, R_alive_p, R_dead_p, alpha, beta, directed,
+                                                                 **approximate)
+            _log_report(phase, report)
+            return dg, avoid
+        return find_discriminative_graph_from_corpus(corpus, R_alive_p, R_dead_p, alpha, beta, directed, weighted)
+
+
+def phase_harmful_edges(corpus, unit):
+    phase, min_support_dead, max_support_alive, directed, weighted, approximate = unit
+    R_alive_p = corpus.select(phase=phase, mortality=0)
+    R_dead_p = corpus.select(phase=phase, mortality=1)
+    with stage("harmful_edges", phase=phase):
+        if approximate is not None:
+            harmful, report = find_harmful_edges_approx(corpus, R_dead_p, R_alive_p, min_support_dead,
+                                                        max_support_alive, directed is not False, **approximate)
+            _log_report(phase, report)
+            return harmful
+        return find_harmful_edges_from_corpus(corpus, R_dead_p, R_alive_p, min_support_dead, max_support_alive,
+                                              directed is not False, weighted)
+
+
+def _log_report(phase, report):
+    if report is not None:
+        log.info("Approximate support (%s): %s candidates re-verified, Count-Min error %s (delta %.3g), "
+                 "heavy-hitter error %s, %s bytes", phase, report.candidates, [round(e, 3) for e in report.count_min_error],
+                 report.delta, [round(e, 3) for e in report.heavy_hitter_error], report.memory_bytes)
+
+
+def phase_avoid_patterns(corpus, unit):
+    phase, harmful, max_hops, directed = unit
+    with stage("avoid_patterns", phase=phase):
+        return extract_action_patterns_from_corpus(corpus, corpus.select(phase=phase, mortality=1), harmful, max_hops,
+                                                   directed is not False)
+
+
+def phase_accuracy(corpus, unit):
+    phase, disc_graph, directed = unit
+    R_alive_p = corpus.select(phase=phase, mortality=0)
+    R_dead_p = corpus.select(phase=phase, mortality=1)
+    with stage("accuracy", phase=phase):
+        return evaluate_accuracy_from_corpus([disc_graph], corpus, R_alive_p, R_dead_p, directed is not False)
+
+
+def phase_predictions(corpus, unit):
+    # linear mortality score over the mined patterns: do (discriminative) and avoid
+    # edges, harmful edges and avoid paths, weighted by their log odds in the phase
+    phase, disc_graph, avoid_graph, harmful, avoid_patterns, directed, weighted = unit
+    with stage("predictions", phase=phase):
+        R_alive_p = corpus.select(phase=phase, mortality=0)
+        R_dead_p = corpus.select(phase=phase, mortality=1)
+        phase_groups = np.concatenate([R_alive_p, R_dead_p])
+        phase_labels = np.repeat([0, 1], [len(R_alive_p), len(R_dead_p)])
+
+        features = PatternFeatures.from_corpus(corpus, phase_groups, paths=avoid_patterns, counts=weighted,
+                                               directed=directed is not False)
+        patterns = list(disc_graph.edges()) + list(avoid_graph.edges()) + list(harmful) + list(avoid_patterns)
+        scorer = PatternScorer.fit(features, phase_labels, patterns)
+        count("patients", features.shape[0])
+        count("patterns", int(np.count_nonzero(scorer.weights)))
+        return phase_labels.tolist(), scorer.predict(features).tolist()
@@ -0,0 +1,347 @@
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from discgraph import _discriminative_graphs, _empty
+from harmfulEdges import _harmful
+from support import EdgeSupport, count_support, undirected_keys
+import instrument
+
+log = logging.getLogger(__name__)
+
+# candidates: edges re-verified exactly; count_min_error: per-class ε·N overestimate bound
+# (holding with probability 1 - delta); heavy_hitter_error: per-class N / (capacity + 1)
+# underestimate bound of the heavy-hitter counters; complete: whether every edge that can
+# pass the threshold was guaranteed a candidate; memory_bytes: size of the sketches
+ApproxReport = namedtuple("ApproxReport", ["candidates", "count_min_error", "delta", "heavy_hitter_error",
+                                           "totals", "complete", "memory_bytes"])
+
+# edge keys of the approximate mode pack two 32-bit code ids, whatever the vocabulary size
+SHIFT = 32
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch of per-class edge support in depth x width counters.
+
+    estimate() never underestimates, and overestimates by more than
+    epsilon * total (epsilon = e / width) with probability at most delta = e^-depth.
+    """
+
+    def __init__(self, n_classes=1, width=1 << 16, depth=4, seed=0):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((n_classes, depth, width), dtype=np.int64)
+        self.total = np.zeros(n_classes, dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing: odd 64-bit multipliers, one per row
+        self.salt = rng.integers(1, 1 << 62, size=depth, dtype=np.int64).astype(np.uint64) * 2 + 1
+
+    @property
+    def epsilon(self):
+        return np.e / self.width
+
+    @property
+    def delta(self):
+        return np.exp(-self.depth)
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def _index(self, keys):
+        keys = np.asarray(keys, dtype=np.int64).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            hashed = keys[None, :] * self.salt[:, None]
+        return ((hashed >> np.uint64(32)) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, cls, keys, counts):
+        index = self._index(keys)
+        for d in range(self.depth):
+            self.table[cls, d] += np.bincount(index[d], weights=counts, minlength=self.width).astype(np.int64)
+        self.total[cls] += int(np.sum(counts))
+
+    def estimate(self, cls, keys):
+        index = self._index(keys)
+        return self.table[cls, np.arange(self.depth)[:, None], index].min(axis=0)
+
+    def error(self, cls):
+        return self.epsilon * self.total[cls]
+
+
+class SpaceSaving:
+    """
+    Heavy-hitter summary holding at most `capacity` edges and their counts.
+
+    Batches are merged as mergeable Misra-Gries / Space-Saving summaries: the
+    counts of the summary and of the batch are added, and if more than
+    `capacity` edges remain the (capacity + 1)-th largest count is subtracted
+    from all of them. Counts are lower bounds, short of the true support by at
+    most total / (capacity + 1), so every edge above that is kept.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.total = 0
+
+    @property
+    def nbytes(self):
+        return 2 * 8 * self.capacity
+
+    def add(self, keys, counts):
+        self.total += int(np.sum(counts))
+        keys, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts])).astype(np.int64)
+        if len(keys) > self.capacity:
+            cut = np.partition(counts, len(counts) - self.capacity - 1)[len(counts) - self.capacity - 1]
+            counts = counts - cut
+            keep = counts > 0
+            keys, counts = keys[keep], counts[keep]
+        self.keys, self.counts = keys, counts
+
+    def error(self):
+        return self.total / (self.capacity + 1)
+
+    def upper(self, keys):
+        # an edge out of the summary has at most error() occurrences
+        idx = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        found = self.keys[idx] == keys if len(self.keys) else np.zeros(len(keys), dtype=bool)
+        return np.where(found, self.counts[idx] if len(self.keys) else 0, 0) + self.error()
+
+
+class ApproximateSupport:
+    """
+    Per-class edge support in fixed memory: one SpaceSaving summary (which
+    edges may be frequent) and one Count-Min row set (how frequent at most)
+    per class, fed batch by batch. candidates() is a superset of the edges
+    reaching a threshold as long as the threshold exceeds heavy-hitter error;
+    their exact support is then re-counted in a second pass (exact_support).
+
+    Parameters:
+        n_classes: int — number of classes
+        capacity: int — edges kept per class by the heavy-hitter summary
+        width, depth: int — Count-Min sketch shape (error e / width, failure probability e^-depth)
+        distinct: bool — graph-level support (as the DSM) instead of transition occurrences (as fsm)
+        directed: bool — False folds u -> v and v -> u into one edge
+    """
+
+    def __init__(self, n_classes=2, capacity=10000, width=1 << 16, depth=4, distinct=True, directed=True, seed=0):
+        self.n_classes = n_classes
+        self.distinct = distinct
+        self.directed = directed
+        self.heavy = [SpaceSaving(capacity) for _ in range(n_classes)]
+        self.sketch = CountMinSketch(n_classes, width, depth, seed)
+        self.totals = np.zeros(n_classes, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return self.sketch.nbytes + sum(h.nbytes for h in self.heavy)
+
+    def update(self, batch):
+        keys, owner, owner_class, n_graphs = _prepare(batch, self.n_classes, self.directed)
+        self.totals += n_graphs
+        unique, counts = count_support(keys, owner, owner_class, self.n_classes, self.distinct)[:2]
+        for cls in range(self.n_classes):
+            present = counts[cls] > 0
+            self.heavy[cls].add(unique[present], counts[cls][present])
+            self.sketch.add(cls, unique[present], counts[cls][present])
+        instrument.count("transitions", len(keys))
+
+    def candidates(self, cls, threshold):
+        """Edges of class `cls` whose support may reach `threshold`."""
+        heavy = self.heavy[cls]
+        upper = np.minimum(heavy.upper(heavy.keys), self.sketch.estimate(cls, heavy.keys))
+        # thresholds come from fractions of the class size; leave room for rounding
+        return heavy.keys[upper >= threshold * (1 - 1e-9)]
+
+    def complete(self, cls, threshold):
+        # edges outside the summary have support <= error(), so none of them can pass
+        return threshold > self.heavy[cls].error()
+
+    def report(self, candidates, complete):
+        return ApproxReport(
+            candidates=len(candidates),
+            count_min_error=[float(self.sketch.error(c)) for c in range(self.n_classes)],
+            delta=float(self.sketch.delta),
+            heavy_hitter_error=[float(h.error()) for h in self.heavy],
+            totals=self.totals.tolist(),
+            complete=bool(complete),
+            memory_bytes=int(self.nbytes),
+        )
+
+
+def _prepare(batch, n_classes, directed):
+    # batch: (src, dst, owner, owner_class) with owner local to the batch
+    src, dst, owner, owner_class = batch
+    keys = (np.asarray(src, dtype=np.int64) << SHIFT) | np.asarray(dst, dtype=np.int64)
+    if not directed:
+        keys = undirected_keys(keys, 1 << SHIFT)
+    owner_class = np.asarray(owner_class, dtype=np.int64)
+    n_graphs = np.bincount(owner_class[owner_class >= 0], minlength=n_classes)
+    return keys, np.asarray(owner, dtype=np.int64), owner_class, n_graphs
+
+
+def exact_support(batches, candidates, n_classes, codes, distinct=True, directed=True):
+    """Second pass: exact class x edge support of the candidate edges only."""
+    candidates = np.unique(candidates)
+    counts = np.zeros((n_classes, len(candidates)), dtype=np.int64)
+    totals = np.zeros(n_classes, dtype=np.int64)
+    for batch in batches:
+        keys, owner, owner_class, n_graphs = _prepare(batch, n_classes, directed)
+        totals += n_graphs
+        keep = np.isin(keys, candidates)
+        unique, batch_counts = count_support(keys[keep], owner[keep], owner_class, n_classes, distinct)[:2]
+        counts[:, np.searchsorted(candidates, unique)] += batch_counts
+    # re-encode the packed keys over the code table, as the exact miners return them
+    n = len(codes)
+    keys = (candidates >> SHIFT) * n + (candidates & ((1 << SHIFT) - 1))
+    order = np.argsort(keys)
+    return EdgeSupport(keys[order], counts[:, order], totals, codes, directed=directed)
+
+
+def corpus_batches(corpus, *classes, batch_groups=100000):
+    """
+    Batches of (src, dst, owner, owner_class) over the corpus groups of each
+    class, at most `batch_groups` groups at a time. Call again for a second pass.
+    """
+    classes = [corpus.group_ids(c) for c in classes]
+    groups = np.concatenate(classes) if classes else np.zeros(0, dtype=np.int64)
+    group_class = np.repeat(np.arange(len(classes)), [len(c) for c in classes])
+    for lo in range(0, len(groups), batch_groups):
+        batch = groups[lo:lo + batch_groups]
+        pos, _ = corpus.transition_index(batch)
+        lengths = corpus.offsets[batch + 1] - corpus.offsets[batch]
+        yield corpus.src[pos], corpus.dst[pos], np.repeat(np.arange(len(batch)), lengths), group_class[lo:lo + batch_groups]
+
+
+def _mine(batches, n_classes, thresholds, codes, distinct=True, directed=True, **sketch):
+    # pass 1: sketches; pass 2: exact support of every edge that may pass a threshold
+    support = ApproximateSupport(n_classes, distinct=distinct, directed=directed, **sketch)
+    for batch in batches():
+        support.update(batch)
+    totals = support.totals
+    candidates, complete = [], True
+    for cls, threshold in thresholds(totals):
+        candidates.append(support.candidates(cls, threshold))
+        complete &= support.complete(cls, threshold)
+    candidates = np.unique(np.concatenate(candidates)) if candidates else np.zeros(0, dtype=np.int64)
+    report = support.report(candidates, complete)
+    instrument.count("candidate_edges", len(candidates))
+    if not complete:
+        log.warning("Approximate support may miss edges: thresholds are below the heavy-hitter error %s; "
+                    "raise capacity.", report.heavy_hitter_error)
+    return exact_support(batches(), candidates, n_classes, codes, distinct, directed), report
+
+
+def find_discriminative_graph_approx(corpus, class1_groups, class2_groups, alpha=0.005, beta=0.5, directed=None,
+                                     batch_groups=100000, **sketch):
+    """
+    find_discriminative_graph_from_corpus in fixed memory: frequent-edge
+    candidates of both classes from the sketches, then an exact count of those
+    candidates only. Returns the same graphs whenever the report is complete.
+
+    Parameters:
+        sketch: capacity, width, depth, seed of ApproximateSupport
+
+    Returns:
+        (G_discriminative, G_to_avoid, ApproxReport)
+    """
+    class1_groups, class2_groups = corpus.group_ids(class1_groups), corpus.group_ids(class2_groups)
+    if len(class1_groups) == 0 or len(class2_groups) == 0:
+        log.warning("One of the classes has no graphs. Cannot compute discriminative subgraph.")
+        return (*_empty(directed), None)
+
+    def batches():
+        return corpus_batches(corpus, class1_groups, class2_groups, batch_groups=batch_groups)
+
+    # class 1 edges reaching alpha and class 2 edges reaching beta (the graph to avoid);
+    # every other edge fails both frequency tests whatever its exact count
+    def thresholds(totals):
+        return [(0, max(alpha * totals[0], 1)), (1, max(beta * totals[1], 1))]
+
+    support, report = _mine(batches, 2, thresholds, corpus.codes, directed=directed is not False, **sketch)
+    return (*_discriminative_graphs(support, alpha, beta, directed), report)
+
+
+def find_harmful_edges_approx(corpus, dead_groups, alive_groups, min_support_dead=10, max_support_alive=2,
+                              directed=True, batch_groups=100000, **sketch):
+    """find_harmful_edges_from_corpus in fixed memory; returns (edges, ApproxReport)."""
+    def batches():
+        return corpus_batches(corpus, dead_groups, alive_groups, batch_groups=batch_groups)
+
+    support, report = _mine(batches, 2, lambda totals: [(0, max(min_support_dead, 1))], corpus.codes,
+                            directed=directed, **sketch)
+    return _harmful(support, min_support_dead, max_support_alive), report
+
+
+def fsm_approx(corpus, τ, groups=None, batch_groups=100000, **sketch):
+    """fsm_from_corpus (transition occurrences >= τ) in fixed memory; returns (edges, ApproxReport)."""
+    def batches():
+        return corpus_batches(corpus, corpus.group_ids(groups), batch_groups=batch_groups)
+
+    support, report = _mine(batches, 1, lambda totals: [(0, max(τ, 1))], corpus.codes, distinct=False, **sketch)
+    return set(support.edges(support.counts[0] >= τ)), report
+
+
+def csv_batches(path, codes, phase=None, chunksize=1000000, presorted=True):
+    """
+    Alive (class 0) and dead (class 1) batches of one phase (every phase if
+    None) streamed from the diagnoses CSV one block of subjects at a time.
+    `codes` is a dict ICD code -> id that grows as codes are met; pass the same
+    dict to every pass so ids agree.
+    """
+    from ingest import _block_corpus, iter_subject_blocks
+
+    for block in iter_subject_blocks(path, chunksize, presorted):
+        corpus = _block_corpus(block)
+        remap = np.array([codes.setdefault(c, len(codes)) for c in corpus.codes], dtype=np.int64)
+        groups = corpus.select(phase=phase)
+        pos, _ = corpus.transition_index(groups)
+        lengths = corpus.offsets[groups + 1] - corpus.offsets[groups]
+        # groups with a missing mortality (-1) are skipped
+        yield (remap[corpus.src[pos]], remap[corpus.dst[pos]], np.repeat(np.arange(len(groups)), lengths),
+               corpus.mortality[groups].astype(np.int64))
+
+
+def mine_phase_stream(path, phase=None, alpha=0.005, beta=0.5, min_support_dead=10, max_support_alive=2,
+                      directed=None, chunksize=1000000, presorted=True, **sketch):
+    """
+    Phase-wise DSM and harmful edges straight from the CSV in fixed memory: two
+    streaming passes (sketch, then exact re-count of the candidates), with the
+    corpus never held in memory.
+
+    Returns:
+        (G_discriminative, G_to_avoid, harmful edges, ApproxReport)
+    """
+    code_ids = {}
+
+    def batches():
+        return csv_batches(path, code_ids, phase, chunksize, presorted)
+
+    def thresholds(totals):
+        return [(0, max(alpha * totals[0], 1)), (1, max(beta * totals[1], 1)), (1, max(min_support_dead, 1))]
+
+    support, report = _mine(batches, 2, thresholds, _CodeList(code_ids), directed=directed is not False, **sketch)
+    disc_graph, avoid_graph = _discriminative_graphs(support, alpha, beta, directed)
+    swapped = EdgeSupport(support.keys, support.counts[::-1], support.totals[::-1], support.codes, directed=support.directed)
+    return disc_graph, avoid_graph, _harmful(swapped, min_support_dead, max_support_alive), report
+
+
+class _CodeList:
+    # code table that is only complete after the first pass: materialized on first use
+    def __init__(self, code_ids):
+        self.code_ids = code_ids
+        self._codes = None
+
+    def __len__(self):
+        return len(self.code_ids)
+
+    def __getitem__(self, index):
+        if self._codes is None or len(self._codes) != len(self.code_ids):
+            self._codes = np.empty(len(self.code_ids), dtype=object)
+            for code, i in self.code_ids.items():
+                self._codes[i] = code
+        return self._codes[index]
@@ -0,0 +1,8 @@
+"""
+Scaling benchmarks for the miners on synthetic MIMIC-shaped data.
+
+    python -m bench --scales 1000 10000 100000 --output bench_results.json
+    python -m bench compare old.json new.json
+    python -m bench check
+"""
+from bench.synthetic import synthetic_frame, write_synthetic_csv
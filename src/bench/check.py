@@ -0,0 +1,137 @@
+"""
+Regression checks of the vectorized miners against the original per-graph
+loops, on the patient graphs of patientGraphs.build_patient_graphs.
+
+    python -m bench check --data ../data/data.csv
+"""
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from accuracy import evaluate_accuracy
+from discgraph import find_discriminative_graph
+from harmfulEdges import find_harmful_edges
+from patientGraphs import build_patient_graphs
+from sube import mine_paths, subE
+from topk import top_k_patterns
+
+# (alpha, beta) and (min_support_dead, max_support_alive) settings checked
+DSM_SETTINGS = ((0.005, 0.5), (0.01, 0.02), (0.02, 0.05))
+HARMFUL_SETTINGS = ((10, 2), (3, 30))
+
+
+def _undirected(edges):
+    return {tuple(sorted(e, key=str)) for e in edges}
+
+
+def reference_discriminative_graph(R_class1, R_class2, alpha=0.005, beta=0.5):
+    # the original loops; u - v and v - u of an undirected graph are one edge
+    candidate_edges = {}
+    for g in R_class1:
+        for edge in _undirected(g.edges()):
+            candidate_edges[edge] = candidate_edges.get(edge, 0) + 1
+    frequent_edges = {e for e, count in candidate_edges.items() if count / len(R_class1) >= alpha}
+    rare_edges = {e for e in frequent_edges if sum(g.has_edge(*e) for g in R_class2) / len(R_class2) <= beta}
+
+    death_edge_counts = {}
+    for g in R_class2:
+        for edge in _undirected(g.edges()):
+            death_edge_counts[edge] = death_edge_counts.get(edge, 0) + 1
+    harmful_edges = {e for e, count in death_edge_counts.items() if count / len(R_class2) >= beta}
+    return rare_edges, harmful_edges
+
+
+def reference_harmful_edges(dead_graphs, alive_graphs, min_support_dead=10, max_support_alive=2):
+    dead_counts, alive_counts = {}, {}
+    for graphs, counts in ((dead_graphs, dead_counts), (alive_graphs, alive_counts)):
+        for g in graphs:
+            for edge in _undirected(g.edges()):
+                counts[edge] = counts.get(edge, 0) + 1
+    return {e for e, count in dead_counts.items()
+            if count >= min_support_dead and alive_counts.get(e, 0) <= max_support_alive}
+
+
+def reference_accuracy(subgraphs, positive_graphs, negative_graphs):
+    # has_edge of an undirected graph matches either orientation of a pattern edge
+    correct_pos = sum(any(all(g.has_edge(*e) for e in sub.edges()) for sub in subgraphs) for g in positive_graphs)
+    correct_neg = sum(any(not all(g.has_edge(*e) for e in sub.edges()) for sub in subgraphs) for g in negative_graphs)
+    return (correct_pos + correct_neg) / (len(positive_graphs) + len(negative_graphs))
+
+
+def reference_paths(G, τ, max_length=3):
+    # runs of consecutive transitions where each one starts at the previous target
+    support = {}
+    for graph in G:
+        found = set()
+        edges = [(str(u), str(v)) for u, v in graph]
+        for i in range(len(edges)):
+            path = edges[i]
+            found.add(path)
+            for u, v in edges[i + 1:i + max_length - 1]:
+                if u != path[-1]:
+                    break
+                path = path + (v,)
+                found.add(path)
+        for path in found:
+            support[path] = support.get(path, 0) + 1
+    return {p: count for p, count in support.items() if count >= τ}
+
+
+def transition_lists(df, shuffle=False, seed=0):
+    """Per (subject, phase) transition lists; shuffle=True breaks them into non-chains."""
+    rng = np.random.default_rng(seed)
+    G = []
+    for _, group in df.sort_values(["subject_id", "phase", "sequence_num"]).groupby(["subject_id", "phase"]):
+        codes = group["icd_code"].astype(str).tolist()
+        edges = list(zip(codes[:-1], codes[1:]))
+        if shuffle:
+            edges = [edges[i] for i in rng.permutation(len(edges))]
+        G.append(edges)
+    return G
+
+
+def check(data="../data/data.csv"):
+    """Compare the miners with the reference loops; returns the list of mismatches (empty if all agree)."""
+    df = pd.read_csv(data)
+    graphs = {"nx": build_patient_graphs(df), "compact": build_patient_graphs(df, compact=True)}
+    alive, dead = graphs["nx"]
+    failures = []
+    for alpha, beta in DSM_SETTINGS:
+        rare, harmful = reference_discriminative_graph(alive, dead, alpha, beta)
+        for kind, (a, d) in graphs.items():
+            disc_graph, avoid_graph = find_discriminative_graph(a, d, alpha, beta)
+            if not isinstance(disc_graph, nx.Graph) or disc_graph.is_directed():
+                failures.append(f"find_discriminative_graph({kind}) should return undirected graphs")
+            if _undirected(disc_graph.edges()) != rare or _undirected(avoid_graph.edges()) != harmful:
+                failures.append(f"find_discriminative_graph({kind}, alpha={alpha}, beta={beta}): "
+                                f"{disc_graph.number_of_edges()} edges, expected {len(rare)}")
+    for msd, msa in HARMFUL_SETTINGS:
+        expected = reference_harmful_edges(dead, alive, msd, msa)
+        for kind, (a, d) in graphs.items():
+            found = _undirected(find_harmful_edges(d, a, msd, msa))
+            if found != expected:
+                failures.append(f"find_harmful_edges({kind}, {msd}, {msa}): {len(found)} edges, expected {len(expected)}")
+
+    # patient edges reversed against the orientation the graphs store them in
+    disc_graph, _ = find_discriminative_graph(alive, dead, *DSM_SETTINGS[1])
+    patterns = [nx.Graph(disc_graph.edges())] + [nx.DiGraph([(v, u)]) for u, v in list(alive[0].edges())[:3]]
+    expected = reference_accuracy(patterns, alive, dead)
+    for kind, (a, d) in graphs.items():
+        found = evaluate_accuracy(patterns, a, d)
+        if type(found) is not float or found != expected:
+            failures.append(f"evaluate_accuracy({kind}): {found!r}, expected {expected!r}")
+
+    # path patterns over chained and shuffled (non-chain) transition lists
+    for name, G in (("chains", transition_lists(df)), ("shuffled", transition_lists(df, shuffle=True))):
+        expected = reference_paths(G, 2)
+        found = mine_paths(G, 2)
+        if found != expected:
+            failures.append(f"mine_paths({name}): {len(found)} paths, expected {len(expected)}")
+        half = len(G) // 2
+        occurring = reference_paths(G, 1)
+        fake = [p.pattern for p in top_k_patterns(G[:half], G[half:], k=200) if p.pattern not in occurring]
+        if fake:
+            failures.append(f"top_k_patterns({name}): {len(fake)} patterns that occur in no graph, e.g. {fake[0]}")
+    if subE(("A", "B"), [[("A", "B"), ("C", "D")]] * 2, 1, {("A", "B"), ("C", "D")}):
+        failures.append("subE extends A -> B with a transition not starting at B")
+    return failures
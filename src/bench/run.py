@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from corpus import load_corpus
+from fsm import fsm_from_corpus
+from sube import mine_paths_from_corpus, subE_from_corpus
+from discgraph import find_discriminative_graph_from_corpus
+from harmfulEdges import find_harmful_edges_from_corpus
+from actionAvoid import extract_action_patterns_from_corpus
+from accuracy import evaluate_accuracy_from_corpus
+from bench.check import check
+from bench.synthetic import write_synthetic_csv
+
+SCALES = (10 ** 3, 10 ** 4, 10 ** 5)
+
+
+def measure(fn, *args, memory=True, **kwargs):
+    """
+    Run fn and return (result, record) with wall and CPU seconds, the process
+    peak RSS (lifetime ru_maxrss) and how much fn raised it. With `memory`, fn runs a second time under tracemalloc for the peak
+    of traced allocations (numpy buffers included); tracing slows Python-heavy
+    code down a lot, so the timed run is never traced.
+    """
+    rss = _process_peak_rss()
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn(*args, **kwargs)
+    record = {"wall_s": time.perf_counter() - wall, "cpu_s": time.process_time() - cpu}
+    if memory:
+        tracemalloc.start()
+        fn(*args, **kwargs)
+        record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    record["process_peak_rss_bytes"] = _process_peak_rss()
+    record["peak_rss_growth_bytes"] = record["process_peak_rss_bytes"] - rss
+    return result, record
+
+
+def _process_peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _size(result):
+    if hasattr(result, "number_of_edges"):
+        return result.number_of_edges()
+    if isinstance(result, tuple):
+        return _size(result[0])
+    return len(result) if hasattr(result, "__len__") else None
+
+
+def bench_miners(corpus, memory=True, τ=2, alpha=0.005, beta=0.5, min_support_dead=10, max_support_alive=2, phase="early"):
+    """Yield (miner, result, record) for every miner on one corpus, in pipeline order."""
+    alive = corpus.select(phase=phase, mortality=0)
+    dead = corpus.select(phase=phase, mortality=1)
+
+    frequent, record = measure(fsm_from_corpus, corpus, τ, memory=memory)
+    yield "fsm", frequent, record
+    top_edge = max(frequent, key=str) if frequent else None
+    if top_edge is not None:
+        result, record = measure(subE_from_corpus, top_edge, corpus, τ, frequent, memory=memory)
+        yield "subE", result, record
+    result, record = measure(mine_paths_from_corpus, corpus, τ, 3, memory=memory)
+    yield "mine_paths", result, record
+    (disc_graph, _), record = measure(find_discriminative_graph_from_corpus, corpus, alive, dead, alpha, beta, memory=memory)
+    yield "find_discriminative_graph", disc_graph, record
+    harmful, record = measure(find_harmful_edges_from_corpus, corpus, dead, alive, min_support_dead, max_support_alive, memory=memory)
+    yield "find_harmful_edges", harmful, record
+    result, record = measure(extract_action_patterns_from_corpus, corpus, dead, harmful, memory=memory)
+    yield "extract_action_patterns", result, record
+    result, record = measure(evaluate_accuracy_from_corpus, [disc_graph], corpus, alive, dead, memory=memory)
+    yield "evaluate_accuracy", [result], record
+
+
+def _commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales=SCALES, output="bench_results.json", workdir=None, n_codes=200, mean_length=9.0,
+        mortality_rate=0.5, seed=0, memory=True, **miner_params):
+    """
+    Generate a synthetic table per scale point, load it and time every miner.
+    Results are written to `output` as JSON and returned.
+    """
+    report = {
+        "commit": _commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "params": {"n_codes": n_codes, "mean_length": mean_length, "mortality_rate": mortality_rate,
+                   "seed": seed, **miner_params},
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for n_patients in scales:
+            path = os.path.join(tmp, f"synthetic_{n_patients}.csv")
+            rows, record = measure(write_synthetic_csv, path, n_patients, memory=False, n_codes=n_codes,
+                                   mean_length=mean_length, mortality_rate=mortality_rate, seed=seed)
+            report["results"].append({"patients": n_patients, "rows": rows, "miner": "generate", **record})
+            corpus, record = measure(load_corpus, path, memory=memory, chunksize=1_000_000)
+            report["results"].append({"patients": n_patients, "rows": rows, "miner": "load_corpus", **record})
+            for miner, result, record in bench_miners(corpus, memory, **miner_params):
+                report["results"].append({"patients": n_patients, "rows": rows, "miner": miner,
+                                          "result_size": _size(result), **record})
+            os.remove(path)
+            print(f"{n_patients} patients: " + ", ".join(
+                f"{r['miner']} {r['wall_s']:.2f}s" for r in report["results"] if r["patients"] == n_patients))
+
+    with open(output, "w") as f:
+        json.dump(report, f, indent=1)
+    return report
+
+
+def compare(old_path, new_path):
+    """Print the new/old wall time and peak memory ratio of every (scale, miner) in both files."""
+    with open(old_path) as f:
+        old = {(r["patients"], r["miner"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    print(f"{'patients':>9} {'miner':<26} {'wall':>8} {'ratio':>7} {'peak MB':>9} {'ratio':>7}")
+    for r in new:
+        before = old.get((r["patients"], r["miner"]))
+        if before is None:
+            continue
+        print(f"{r['patients']:>9} {r['miner']:<26} {r['wall_s']:>8.3f} {r['wall_s'] / max(before['wall_s'], 1e-9):>7.2f}"
+              f" {r.get('peak_bytes', 0) / 2 ** 20:>9.1f} {r.get('peak_bytes', 0) / max(before.get('peak_bytes', 0), 1):>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Miner scaling benchmark on synthetic data")
+    sub = parser.add_subparsers(dest="command")
+    cmp_parser = sub.add_parser("compare", help="compare two result files")
+    cmp_parser.add_argument("old")
+    cmp_parser.add_argument("new")
+    check_parser = sub.add_parser("check", help="compare the miners with the original loops on the bundled data")
+    check_parser.add_argument("--data", default="../data/data.csv")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="patient counts, e.g. 1000 ... 1000000")
+    parser.add_argument("--codes", type=int, default=200, help="ICD vocabulary size")
+    parser.add_argument("--mean-length", type=float, default=9.0, help="mean codes per patient")
+    parser.add_argument("--mortality-rate", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tau", type=int, default=2)
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced second run measuring peak memory")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--workdir", default=None, help="where the synthetic CSVs are written")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        compare(args.old, args.new)
+        return
+    if args.command == "check":
+        failures = check(args.data)
+        print("\n".join(failures) or "all checks passed")
+        raise SystemExit(1 if failures else 0)
+    run(args.scales, args.output, args.workdir, args.codes, args.mean_length, args.mortality_rate, args.seed,
+        not args.no_memory, τ=args.tau)
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from classify import CODE_LABELS
+
+COLUMNS = ["subject_id", "hadm_id", "icd_code", "icd_version", "label", "sequence_num",
+           "phase", "action_type", "mortality", "node_id"]
+PHASES = ("early", "middle", "late")
+ACTION_TYPES = ("diagnosis", "procedure", "med")
+
+
+def vocabulary(n_codes):
+    """The real ICD codes of data.csv first, then synthetic ones, each with its label."""
+    codes = list(CODE_LABELS)[:n_codes]
+    codes += [f"X{i:05d}" for i in range(n_codes - len(codes))]
+    labels = np.array([CODE_LABELS.get(c, i % 3) for i, c in enumerate(codes)], dtype=np.int64)
+    return np.array(codes, dtype=object), labels
+
+
+def _code_weights(n_codes, zipf, rng):
+    # Zipf-like code popularity, so some transitions repeat across patients
+    weights = 1.0 / np.arange(1, n_codes + 1) ** zipf
+    return rng.permutation(weights / weights.sum())
+
+
+def synthetic_frame(n_patients=1000, n_codes=23, mean_length=9.0, min_length=3, max_length=None,
+                    mortality_rate=0.5, signal=0.2, zipf=1.0, seed=0, first_subject=1001):
+    """
+    Synthetic diagnoses table with the schema of data/data.csv: one admission
+    per subject, its codes numbered by sequence_num and split evenly into the
+    early/middle/late phases, one mortality value per subject.
+
+    Parameters:
+        n_patients: int — number of subjects
+        n_codes: int — ICD vocabulary size (the 23 real codes come first)
+        mean_length, min_length, max_length: codes per subject,
+            min_length + Poisson(mean_length - min_length), clipped to max_length
+        mortality_rate: float — fraction of subjects who died
+        signal: float — share of a dead subject's codes drawn from a shifted code
+                        popularity, giving the DSM something to find (0 for none)
+        zipf: float — skew of code popularity
+        seed: int — random seed; the same parameters always give the same frame
+    """
+    rng = np.random.default_rng(seed)
+    codes, code_labels = vocabulary(n_codes)
+    alive_weights = _code_weights(n_codes, zipf, rng)
+    dead_weights = np.roll(alive_weights, max(1, n_codes // 4))
+
+    lengths = min_length + rng.poisson(max(mean_length - min_length, 0), n_patients)
+    if max_length is not None:
+        lengths = np.minimum(lengths, max_length)
+    mortality = (rng.random(n_patients) < mortality_rate).astype(np.int64)
+
+    n_rows = int(lengths.sum())
+    patient = np.repeat(np.arange(n_patients), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    position = np.arange(n_rows) - starts
+    dead_row = mortality[patient] == 1
+
+    code_ids = rng.choice(n_codes, n_rows, p=alive_weights)
+    shifted = dead_row & (rng.random(n_rows) < signal)
+    code_ids[shifted] = rng.choice(n_codes, int(shifted.sum()), p=dead_weights)
+
+    subject = first_subject + patient
+    sequence_num = position + 1
+    return pd.DataFrame({
+        "subject_id": subject,
+        "hadm_id": 500001 + patient,
+        "icd_code": codes[code_ids],
+        "icd_version": rng.choice([9, 10], n_rows),
+        "label": code_labels[code_ids],
+        "sequence_num": sequence_num,
+        "phase": np.array(PHASES, dtype=object)[position * len(PHASES) // lengths[patient]],
+        "action_type": np.array(ACTION_TYPES, dtype=object)[rng.integers(0, len(ACTION_TYPES), n_rows)],
+        "mortality": mortality[patient],
+        "node_id": pd.Series(subject).astype(str) + "_" + pd.Series(sequence_num).astype(str),
+    }, columns=COLUMNS)
+
+
+def write_synthetic_csv(path, n_patients=1000, chunk_patients=100_000, seed=0, **params):
+    """
+    Write a synthetic table to `path`, generating `chunk_patients` subjects at a
+    time so 10⁶-patient files never sit in memory whole. Returns the row count.
+    """
+    rows = 0
+    for i, lo in enumerate(range(0, n_patients, chunk_patients)):
+        n = min(chunk_patients, n_patients - lo)
+        frame = synthetic_frame(n, seed=seed + i, first_subject=1001 + lo, **params)
+        frame["hadm_id"] += lo
+        frame.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        rows += len(frame)
+    return rows
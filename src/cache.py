@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from corpus import Corpus, PHASES
+
+# bump when the on-disk layout or the way corpus_from_frame groups rows changes
+CACHE_VERSION = 1
+
+# per-group and per-transition arrays stored as one .npy file each
+ARRAYS = ("src", "dst", "offsets", "subject_id", "hadm_id", "phase", "mortality", "label")
+
+
+def source_hash(path, block=1 << 20):
+    """Content hash of the source file, so touching it without changes keeps the cache."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(path, phases=PHASES):
+    """Key of the cached corpus: source content plus every parameter that changes the grouping."""
+    params = json.dumps({"version": CACHE_VERSION, "phases": list(phases)})
+    return hashlib.sha256((source_hash(path) + params).encode()).hexdigest()[:24]
+
+
+def save_corpus(corpus, directory):
+    """
+    Write the corpus arrays to `directory` as .npy files. The directory is built
+    under a temporary name and renamed into place, so a concurrent reader never
+    sees a half-written cache.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    tmpdir = tempfile.mkdtemp(prefix=".tmp_", dir=parent)
+    try:
+        for name in ARRAYS:
+            np.save(os.path.join(tmpdir, f"{name}.npy"), getattr(corpus, name))
+        np.save(os.path.join(tmpdir, "codes.npy"), corpus.codes.astype(str))
+        with open(os.path.join(tmpdir, "meta.json"), "w") as f:
+            json.dump({"version": CACHE_VERSION, "phases": list(corpus.phases)}, f)
+        os.replace(tmpdir, directory)
+    except OSError:
+        # another process published the same key first; its copy is identical
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        if not os.path.isdir(directory):
+            raise
+
+
+def load_cached_corpus(directory, mmap=True):
+    """Map a corpus written by save_corpus() back in; arrays are read-only memmaps when `mmap`."""
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in ARRAYS}
+    codes = np.load(os.path.join(directory, "codes.npy"))
+    return Corpus(codes=codes, phases=meta["phases"], **arrays)
+
+
+def cached_load_corpus(path, cache_dir, chunksize=None, presorted=True, mmap=True):
+    """
+    load_corpus() through an on-disk cache. A warm start hashes the CSV and maps
+    the cached arrays without parsing it; a cold start parses, writes the cache
+    and removes the entries left by earlier versions of the same file.
+    """
+    from corpus import load_corpus
+
+    # entries are named <file stem>-<path hash>-<cache key>; the prefix identifies the source
+    stem = os.path.splitext(os.path.basename(path))[0]
+    prefix = f"{stem}-{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]}"
+    directory = os.path.join(cache_dir, f"{prefix}-{cache_key(path)}")
+    if os.path.isfile(os.path.join(directory, "meta.json")):
+        return load_cached_corpus(directory, mmap)
+
+    corpus = load_corpus(path, chunksize=chunksize, presorted=presorted)
+    # stale entries of this source are invalidated by its new content hash
+    if os.path.isdir(cache_dir):
+        for entry in os.listdir(cache_dir):
+            if entry.rsplit("-", 1)[0] == prefix:
+                shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+    save_corpus(corpus, directory)
+    return load_cached_corpus(directory, mmap)
@@ -1,7 +1,5 @@
 import pandas as pd
 
-df = pd.read_csv("../data/data.csv", dtype=str)
-
 # Define ICD codes for each category
 urgent_codes = [
     "J18.9", "P07.30", "S06.0X0A", "A41.9", "I21.9", 
@@ -26,8 +24,26 @@ def label_code(x):
     else:
         return -1  # Unknown code (optional)
 
-# Apply the labeling function
-df['label'] = df['icd_code'].apply(label_code)
-# save the updated dataframe back to the same file (or a new one)
-df.to_csv("../data/data.csv", index=False)
-# print(df['label'].value_counts())
\ No newline at end of file
+# code -> label lookup for vectorized labeling
+CODE_LABELS = {
+    **{code: 0 for code in non_urgent_codes},
+    **{code: 2 for code in chronic_codes},
+    **{code: 1 for code in urgent_codes},
+}
+
+def label_codes(codes):
+    # vectorized label_code over a Series of ICD codes (categorical Series map only their categories)
+    return codes.map(CODE_LABELS).astype("float").fillna(-1).astype("int8")
+
+def label_file(path="../data/data.csv"):
+    df = pd.read_csv(path, dtype=str)
+    # Apply the labeling function
+    df['label'] = label_codes(df['icd_code'])
+    # save the updated dataframe back to the same file (or a new one)
+    df.to_csv(path, index=False)
+    # print(df['label'].value_counts())
+    return df
+
+
+if __name__ == "__main__":
+    label_file("../data/data.csv")
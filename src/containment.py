@@ -0,0 +1,127 @@
+import numpy as np
+
+from corpus import edge_keys
+from support import is_directed, pack_graphs, undirected_keys
+
+
+class ContainmentIndex:
+    """
+    Edge and node sets of many patient graphs stored as bitmaps over one global
+    vocabulary, so "graph contains every edge of pattern P" is a vectorized
+    subset test across all graphs at once.
+
+    The bitmaps are kept inverted (one packed bit row over the graphs for every
+    edge or node): a pattern with k edges is the AND of k rows, whatever the
+    number of graphs.
+
+    With directed=False an edge matches either orientation.
+
+    Attributes:
+        codes: np.ndarray — node labels indexed by code id
+        vocab: np.ndarray[int64] — sorted edge keys, one bitmap row each
+        edge_bits: np.ndarray[uint8] — (edge + 1) x packed-graph bitmap; the last row is all ones
+        node_bits: np.ndarray[uint8] — code x packed-graph bitmap
+    """
+
+    def __init__(self, src, dst, owner, n_graphs, codes, directed=True):
+        self.codes = codes
+        self.code_index = {c: i for i, c in enumerate(codes)}
+        self.n_graphs = n_graphs
+        self.directed = directed
+        keys = edge_keys(src, dst, len(codes))
+        if not directed:
+            keys = undirected_keys(keys, len(codes))
+        self.vocab, columns = np.unique(keys, return_inverse=True)
+        self.edge_bits = self._bitmap(columns, owner, len(self.vocab) + 1)
+        self.edge_bits[-1] = 0xFF
+        nodes = np.concatenate([src, dst]).astype(np.int64)
+        self.node_bits = self._bitmap(nodes, np.concatenate([owner, owner]), len(codes))
+
+    def _bitmap(self, rows, graphs, n_rows):
+        bits = np.zeros((n_rows, -(-self.n_graphs // 8)), dtype=np.uint8)
+        graphs = np.asarray(graphs, dtype=np.int64)
+        np.bitwise_or.at(bits, (rows, graphs >> 3), np.left_shift(1, 7 - (graphs & 7)).astype(np.uint8))
+        return bits
+
+    @classmethod
+    def from_graphs(cls, graphs, directed=None):
+        """
+        Index nx graphs, PatientGraphs or edge lists. directed=None follows the
+        graphs: if every graph is undirected the index is undirected, otherwise
+        each undirected graph contains its edges in both orientations, as its
+        has_edge() does.
+        """
+        graphs = list(graphs)
+        src, dst, lengths, codes = pack_graphs(graphs)
+        owner = np.repeat(np.arange(len(lengths)), lengths)
+        undirected = np.array([not is_directed(g) for g in graphs], dtype=bool)
+        if directed is None:
+            directed = not (graphs and undirected.all())
+        if directed and undirected.any():
+            both = undirected[owner]
+            src, dst, owner = (np.concatenate([src, dst[both]]), np.concatenate([dst, src[both]]),
+                               np.concatenate([owner, owner[both]]))
+        return cls(src, dst, owner, len(graphs), codes, directed)
+
+    @classmethod
+    def from_corpus(cls, corpus, groups=None, directed=True):
+        """Row i of the index is corpus group groups[i]."""
+        groups = corpus.group_ids(groups)
+        pos, _ = corpus.transition_index(groups)
+        lengths = corpus.offsets[groups + 1] - corpus.offsets[groups]
+        owner = np.repeat(np.arange(len(groups)), lengths)
+        return cls(corpus.src[pos], corpus.dst[pos], owner, len(groups), corpus.codes, directed)
+
+    def __len__(self):
+        return self.n_graphs
+
+    def _column(self, u, v):
+        # bitmap row of edge u -> v, None if the edge never occurs in any graph
+        i, j = self.code_index.get(u), self.code_index.get(v)
+        if i is None or j is None:
+            return None
+        key = i * len(self.codes) + j if self.directed else min(i, j) * len(self.codes) + max(i, j)
+        col = int(np.searchsorted(self.vocab, key))
+        return col if col < len(self.vocab) and self.vocab[col] == key else None
+
+    def _pattern_rows(self, patterns):
+        # pattern x max-edges matrix of bitmap rows, padded with the all-ones row
+        rows = []
+        possible = np.ones(len(patterns), dtype=bool)
+        for p, pattern in enumerate(patterns):
+            edges = pattern.edges() if hasattr(pattern, "edges") else pattern
+            columns = [self._column(u, v) for u, v in edges]
+            if None in columns:
+                possible[p] = False
+                columns = []
+            rows.append(columns)
+        width = max([len(r) for r in rows] + [1])
+        padded = np.full((len(rows), width), len(self.vocab), dtype=np.int64)
+        for p, columns in enumerate(rows):
+            padded[p, :len(columns)] = columns
+        return padded, possible
+
+    def contains(self, patterns, chunk=1 << 24):
+        """
+        Graph x pattern boolean matrix: True where the graph holds every edge of
+        the pattern. Patterns are nx graphs or iterables of (src, dst) edges.
+        """
+        rows, possible = self._pattern_rows(patterns)
+        result = np.zeros((len(patterns), self.n_graphs), dtype=bool)
+        # gather pattern x edge x bytes in blocks of about `chunk` bytes
+        step = max(1, chunk // max(1, rows.shape[1] * self.edge_bits.shape[1]))
+        for lo in range(0, len(patterns), step):
+            packed = np.bitwise_and.reduce(self.edge_bits[rows[lo:lo + step]], axis=1)
+            result[lo:lo + step] = np.unpackbits(packed, axis=1, count=self.n_graphs).astype(bool)
+        result[~possible] = False
+        return result.T
+
+    def has_nodes(self, nodes):
+        """Boolean vector: True where the graph contains every node in `nodes`."""
+        packed = np.full(self.node_bits.shape[1], 0xFF, dtype=np.uint8)
+        for node in nodes:
+            i = self.code_index.get(node)
+            if i is None:
+                return np.zeros(self.n_graphs, dtype=bool)
+            packed &= self.node_bits[i]
+        return np.unpackbits(packed, count=self.n_graphs).astype(bool)
@@ -0,0 +1,257 @@
+import numpy as np
+import networkx as nx
+
+import instrument
+
+PHASES = ("early", "middle", "late")
+
+
+def edge_keys(src, dst, n_codes):
+    # pack (src, dst) code id pairs into a single int64 key per transition
+    return np.asarray(src, dtype=np.int64) * n_codes + np.asarray(dst, dtype=np.int64)
+
+
+class Corpus:
+    """
+    Integer-encoded transition corpus shared by every miner.
+
+    Each (subject_id, phase) group of the diagnoses table is one patient graph.
+    ICD codes are interned into `codes`, and the transitions of group i are
+    src[offsets[i]:offsets[i + 1]] -> dst[offsets[i]:offsets[i + 1]] in visit order.
+
+    Attributes:
+        codes: np.ndarray[str] — interned ICD codes, indexed by code id
+        src, dst: np.ndarray[int32] — code ids of every transition
+        offsets: np.ndarray[int64] — CSR-style group boundaries into src/dst
+        subject_id, hadm_id: np.ndarray[int64] — ids per group
+        phase: np.ndarray[int8] — index into `phases` per group
+        mortality, label: np.ndarray[int8] — first-row values per group (-1 if missing)
+    """
+
+    def __init__(self, codes, src, dst, offsets, subject_id, hadm_id, phase,
+                 mortality, label, phases=PHASES):
+        self.codes = np.asarray(codes, dtype=object)
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.subject_id = np.asarray(subject_id, dtype=np.int64)
+        self.hadm_id = np.asarray(hadm_id, dtype=np.int64)
+        self.phase = np.asarray(phase, dtype=np.int8)
+        self.mortality = np.asarray(mortality, dtype=np.int8)
+        self.label = np.asarray(label, dtype=np.int8)
+        self.phases = tuple(phases)
+        self.code_index = {c: i for i, c in enumerate(self.codes)}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return f"Corpus(groups={len(self)}, transitions={len(self.src)}, codes={self.n_codes})"
+
+    @property
+    def n_codes(self):
+        return len(self.codes)
+
+    @property
+    def keys(self):
+        return edge_keys(self.src, self.dst, self.n_codes)
+
+    def sizes(self):
+        # number of transitions per group
+        return np.diff(self.offsets)
+
+    def select(self, phase=None, mortality=None, label=None, min_edges=1):
+        """Return the ids of the groups matching every given column value."""
+        mask = self.sizes() >= min_edges
+        if phase is not None:
+            mask &= self.phase == self.phases.index(phase)
+        if mortality is not None:
+            mask &= self.mortality == mortality
+        if label is not None:
+            mask &= self.label == label
+        return np.flatnonzero(mask)
+
+    def group_ids(self, groups=None):
+        if groups is None:
+            return np.arange(len(self))
+        groups = np.asarray(groups)
+        if groups.dtype == bool:
+            return np.flatnonzero(groups)
+        return groups.astype(np.int64, copy=False)
+
+    def transition_index(self, groups=None):
+        """
+        Positions of the transitions of `groups` inside src/dst, together with
+        the group each position belongs to.
+        """
+        groups = self.group_ids(groups)
+        starts = self.offsets[groups]
+        lengths = self.offsets[groups + 1] - starts
+        owner = np.repeat(groups, lengths)
+        first = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return first + np.arange(lengths.sum(), dtype=np.int64), owner
+
+    def take(self, groups):
+        """New corpus holding only `groups`, in that order."""
+        groups = self.group_ids(groups)
+        pos, _ = self.transition_index(groups)
+        lengths = self.offsets[groups + 1] - self.offsets[groups]
+        return Corpus(
+            codes=self.codes,
+            src=self.src[pos],
+            dst=self.dst[pos],
+            offsets=np.concatenate([[0], np.cumsum(lengths)]),
+            subject_id=self.subject_id[groups],
+            hadm_id=self.hadm_id[groups],
+            phase=self.phase[groups],
+            mortality=self.mortality[groups],
+            label=self.label[groups],
+            phases=self.phases,
+        )
+
+    def encode_edges(self, edges):
+        """Encode (code, code) pairs to keys; pairs with unknown codes become -1."""
+        keys = []
+        for u, v in edges:
+            i = self.code_index.get(str(u))
+            j = self.code_index.get(str(v))
+            keys.append(-1 if i is None or j is None else i * self.n_codes + j)
+        return np.asarray(keys, dtype=np.int64)
+
+    def decode_keys(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        return list(zip(self.codes[keys // self.n_codes], self.codes[keys % self.n_codes]))
+
+    def edges(self, i):
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.codes[self.src[lo:hi]], self.codes[self.dst[lo:hi]]))
+
+    def edge_lists(self, groups=None):
+        # the list-of-edge-lists format taken by fsm() and subE()
+        return [self.edges(i) for i in self.group_ids(groups)]
+
+    def graph(self, i):
+        g = nx.DiGraph()
+        g.add_edges_from(self.edges(i))
+        return g
+
+    def graphs(self, groups=None):
+        groups = self.group_ids(groups)
+        instrument.count("graphs_built", len(groups))
+        return [self.graph(i) for i in groups]
+
+    def patient_graphs(self, groups=None, directed=True):
+        """Compact PatientGraph per group, with transition counts as edge weights."""
+        from graph import patient_graphs
+
+        groups = self.group_ids(groups)
+        pos, _ = self.transition_index(groups)
+        lengths = self.offsets[groups + 1] - self.offsets[groups]
+        return patient_graphs(self.codes, self.src[pos], self.dst[pos],
+                              np.concatenate([[0], np.cumsum(lengths)]), directed, self.code_index)
+
+
+def corpus_from_frame(df, phases=PHASES):
+    """
+    Build a Corpus from a diagnoses frame with subject_id, hadm_id, icd_code,
+    sequence_num, phase and mortality columns (label is optional).
+    """
+    import pandas as pd
+
+    df = df.assign(_seq=pd.to_numeric(df["sequence_num"]))
+    known = list(phases) + sorted(set(df["phase"].dropna().astype(str)) - set(phases))
+    df = df.assign(_phase=df["phase"].map({p: i for i, p in enumerate(known)}).astype("int64"))
+    df = df.assign(_subject=pd.to_numeric(df["subject_id"]))
+    df = df.sort_values(["_subject", "_phase", "_seq"], kind="stable")
+
+    codes, code_ids = np.unique(df["icd_code"].astype(str).to_numpy(), return_inverse=True)
+    subject = df["_subject"].to_numpy(dtype=np.int64)
+    phase = df["_phase"].to_numpy(dtype=np.int64)
+
+    # a new group starts wherever subject or phase changes
+    n = len(df)
+    start = np.ones(n, dtype=bool)
+    start[1:] = (subject[1:] != subject[:-1]) | (phase[1:] != phase[:-1])
+    first_rows = np.flatnonzero(start)
+    group_of_row = np.cumsum(start) - 1
+
+    same_group = group_of_row[1:] == group_of_row[:-1]
+    src = code_ids[:-1][same_group]
+    dst = code_ids[1:][same_group]
+    sizes = np.diff(np.append(first_rows, n)) - 1
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+    def first_value(column):
+        if column not in df:
+            return np.full(len(first_rows), -1)
+        values = pd.to_numeric(df[column], errors="coerce").fillna(-1)
+        return values.to_numpy(dtype=np.int64)[first_rows]
+
+    return Corpus(
+        codes=codes,
+        src=src,
+        dst=dst,
+        offsets=offsets,
+        subject_id=subject[first_rows],
+        hadm_id=first_value("hadm_id"),
+        phase=phase[first_rows],
+        mortality=first_value("mortality"),
+        label=first_value("label"),
+        phases=known,
+    )
+
+
+def concat_corpora(parts):
+    """
+    Concatenate corpora built from disjoint slices of the data (e.g. CSV chunks),
+    re-interning their codes and phases into one shared table.
+    """
+    codes = np.unique(np.concatenate([p.codes.astype(str) for p in parts])) if parts else np.zeros(0, dtype=str)
+    phases = list(PHASES)
+    for part in parts:
+        phases += [p for p in part.phases if p not in phases]
+
+    src, dst, sizes, phase = [], [], [], []
+    for part in parts:
+        remap = np.searchsorted(codes, part.codes.astype(str))
+        src.append(remap[part.src])
+        dst.append(remap[part.dst])
+        sizes.append(part.sizes())
+        phase.append(np.array([phases.index(p) for p in part.phases], dtype=np.int64)[part.phase])
+
+    def joined(arrays, dtype=np.int64):
+        return np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+
+    return Corpus(
+        codes=codes,
+        src=joined(src),
+        dst=joined(dst),
+        offsets=np.concatenate([[0], np.cumsum(joined(sizes))]),
+        subject_id=joined([p.subject_id for p in parts]),
+        hadm_id=joined([p.hadm_id for p in parts]),
+        phase=joined(phase),
+        mortality=joined([p.mortality for p in parts]),
+        label=joined([p.label for p in parts]),
+        phases=phases,
+    )
+
+
+def load_corpus(path="../data/data.csv", chunksize=None, presorted=True, cache_dir=None):
+    """
+    Load the diagnoses CSV into a Corpus. With `chunksize`, the file is streamed
+    in chunks of that many rows (see ingest.py) instead of being read whole.
+    With `cache_dir`, the prepared arrays are cached there keyed by the file's
+    content (see cache.py) and later loads map them in without parsing the CSV.
+    """
+    if cache_dir is not None:
+        from cache import cached_load_corpus
+        return cached_load_corpus(path, cache_dir, chunksize, presorted)
+
+    if chunksize is not None:
+        from ingest import load_corpus_chunked
+        return load_corpus_chunked(path, chunksize, presorted)
+
+    import pandas as pd
+
+    df = pd.read_csv(path, dtype=str)
+    return corpus_from_frame(df)
@@ -0,0 +1,159 @@
+from collections import namedtuple
+
+import numpy as np
+
+from accuracy import evaluate_accuracy_from_corpus
+from actionAvoid import extract_action_patterns_from_corpus
+from corpus import PHASES
+from discgraph import _discriminative_graphs
+from features import PatternFeatures, PatternScorer
+from harmfulEdges import _harmful
+from runner import Runner
+from support import EdgeSupport, corpus_support
+import instrument
+
+# folds: one row per phase and fold; summary: one row per phase and metric
+CVResult = namedtuple("CVResult", ["folds", "summary"])
+
+METRICS = ("accuracy", "recovery_precision", "recovery_recall", "mortality_precision", "mortality_recall")
+
+
+def subject_folds(corpus, k=10, seed=0):
+    """Fold id (0..k-1) of every corpus group; all groups of a subject share a fold."""
+    subjects, subject_of_group = np.unique(corpus.subject_id, return_inverse=True)
+    rank = np.random.default_rng(seed).permutation(len(subjects))
+    return (rank % k)[subject_of_group]
+
+
+class FoldSupports:
+    """
+    Alive/dead edge supports of one phase, split by fold, from one counting pass.
+
+    The training support of fold f (every other fold) is the cached global
+    support minus fold f's own counts, so no fold recounts its training graphs.
+
+    Parameters:
+        corpus: Corpus — integer-encoded transition corpus
+        alive_groups, dead_groups: group ids of the phase's alive and dead graphs
+        fold: np.ndarray — fold id of every corpus group (see subject_folds)
+        k: int — number of folds
+        directed: bool — count u -> v and v -> u separately
+        weighted: bool — use the weighted support (transition repeats)
+    """
+
+    def __init__(self, corpus, alive_groups, dead_groups, fold, k, directed=True, weighted=False):
+        self.alive = [alive_groups[fold[alive_groups] == f] for f in range(k)]
+        self.dead = [dead_groups[fold[dead_groups] == f] for f in range(k)]
+        support = corpus_support(corpus, *self.alive, *self.dead, directed=directed)
+        counts = support.weights if weighted else support.counts
+        self.keys, self.codes, self.directed = support.keys, support.codes, directed
+        # (class, fold, edge), class 0 = alive, 1 = dead
+        self.fold_counts = counts.reshape(2, k, len(support.keys))
+        self.fold_totals = support.totals.reshape(2, k)
+        self.counts = self.fold_counts.sum(axis=1)
+        self.totals = self.fold_totals.sum(axis=1)
+
+    def __len__(self):
+        return self.fold_counts.shape[1]
+
+    def train(self, f):
+        """(alive, dead) x edge counts and (alive, dead) totals of every fold but f."""
+        return self.counts - self.fold_counts[:, f], self.totals - self.fold_totals[:, f]
+
+    def split(self, f):
+        """(train alive, train dead, test alive, test dead) group ids of fold f."""
+        others = [g for g in range(len(self)) if g != f]
+        return (np.concatenate([self.alive[g] for g in others]), np.concatenate([self.dead[g] for g in others]),
+                self.alive[f], self.dead[f])
+
+
+def _rates(y_true, y_pred, label):
+    hit = ((y_pred == label) & (y_true == label)).sum()
+    predicted, actual = (y_pred == label).sum(), (y_true == label).sum()
+    return (hit / predicted if predicted else 0.0), (hit / actual if actual else 0.0)
+
+
+def evaluate_fold(corpus, unit):
+    """
+    Mine on the training folds and score the held-out fold: evaluate_accuracy
+    of the discriminative graph, and precision/recall of the pattern scorer
+    fitted on the training rows (see analysis.phase_predictions).
+    """
+    phase, f, split, keys, counts, totals, params = unit
+    train_alive, train_dead, test_alive, test_dead = split
+    alpha, beta, min_support_dead, max_support_alive, max_hops, directed = params
+    with instrument.stage("fold", phase=phase, fold=f):
+        edge_directed = directed is not False
+        disc_graph, avoid_graph = _discriminative_graphs(
+            EdgeSupport(keys, counts, totals, corpus.codes, directed=edge_directed), alpha, beta, directed)
+        harmful = _harmful(EdgeSupport(keys, counts[::-1], totals[::-1], corpus.codes, directed=edge_directed),
+                           min_support_dead, max_support_alive)
+        avoid_patterns = extract_action_patterns_from_corpus(corpus, train_dead, harmful, max_hops, edge_directed)
+        accuracy = evaluate_accuracy_from_corpus([disc_graph], corpus, test_alive, test_dead, edge_directed)
+
+        groups = np.concatenate([train_alive, train_dead, test_alive, test_dead])
+        y = np.repeat([0, 1, 0, 1], [len(train_alive), len(train_dead), len(test_alive), len(test_dead)])
+        n_train = len(train_alive) + len(train_dead)
+        features = PatternFeatures.from_corpus(corpus, groups, paths=avoid_patterns, directed=edge_directed)
+        patterns = list(disc_graph.edges()) + list(avoid_graph.edges()) + list(harmful) + list(avoid_patterns)
+        train = np.arange(len(groups)) < n_train
+        scorer = PatternScorer.fit(PatternFeatures(features.matrix[train], features.patterns, groups[train],
+                                                   edge_directed), y[train], patterns)
+        y_true, y_pred = y[~train], scorer.predict(features.matrix[~train])
+
+    recovery = _rates(y_true, y_pred, 0)
+    mortality = _rates(y_true, y_pred, 1)
+    return {"phase": phase, "fold": f, "train": n_train, "test": int((~train).sum()),
+            "discriminative_edges": disc_graph.number_of_edges(), "harmful_edges": len(harmful),
+            "accuracy": accuracy, "recovery_precision": recovery[0], "recovery_recall": recovery[1],
+            "mortality_precision": mortality[0], "mortality_recall": mortality[1]}
+
+
+def _summary(folds, confidence):
+    import pandas as pd
+    from scipy import stats
+
+    rows = []
+    for phase, table in folds.groupby("phase", sort=False):
+        k = len(table)
+        t = stats.t.ppf((1 + confidence) / 2, k - 1) if k > 1 else np.nan
+        for metric in METRICS:
+            values = table[metric].to_numpy(dtype=float)
+            mean = values.mean()
+            half = t * values.std(ddof=1) / np.sqrt(k) if k > 1 else np.nan
+            rows.append({"phase": phase, "metric": metric, "mean": mean, "ci_low": mean - half, "ci_high": mean + half})
+    return pd.DataFrame(rows)
+
+
+def cross_validate(corpus, k=10, phases=PHASES, alpha=0.005, beta=0.5, min_support_dead=10, max_support_alive=2,
+                   max_hops=3, directed=None, weighted=False, seed=0, confidence=0.95, runner=None, workers=1):
+    """
+    k-fold cross-validation of the phase-wise DSM, grouped by subject_id so no
+    subject is mined and scored in the same fold.
+
+    Each phase counts its edge supports once per fold in a single pass;
+    training supports are the global support minus the held-out fold. Folds
+    then run as independent units on `runner` (or a Runner with `workers`).
+
+    Returns:
+        CVResult — per-fold metrics, and their mean with a `confidence` t interval per phase
+    """
+    import pandas as pd
+
+    fold = subject_folds(corpus, k, seed)
+    params = (alpha, beta, min_support_dead, max_support_alive, max_hops, directed)
+    units = []
+    for phase in phases:
+        with instrument.stage("fold_supports", phase=phase):
+            supports = FoldSupports(corpus, corpus.select(phase=phase, mortality=0),
+                                    corpus.select(phase=phase, mortality=1), fold, k, directed is not False, weighted)
+        for f in range(k):
+            units.append((phase, f, supports.split(f), supports.keys, *supports.train(f), params))
+
+    if runner is None:
+        with Runner(corpus, workers) as runner:
+            results = runner.map(evaluate_fold, units)
+    else:
+        results = runner.map(evaluate_fold, units)
+    folds = pd.DataFrame(results)
+    return CVResult(folds, _summary(folds, confidence))
@@ -1,7 +1,13 @@
+import logging
+
 import networkx as nx
-import matplotlib.pyplot as plt
+import numpy as np
+from support import EdgeSupport, graph_support, corpus_support
+import instrument
+
+log = logging.getLogger(__name__)
 
-def find_discriminative_graph(R_class1, R_class2, alpha=0.005, beta=0.5):
+def find_discriminative_graph(R_class1, R_class2, alpha=0.005, beta=0.5, directed=None, weighted=False):
     """
     alpha = 0.01  # edge appears in at least 1% of graphs 
     beta = 0.3    # edge appears in ≤ 30% of comparison class
@@ -14,74 +20,219 @@ def find_discriminative_graph(R_class1, R_class2, alpha=0.005, beta=0.5):
         R_class2: list of nx.Graph — graphs for the second class (death)
         alpha: float — frequency threshold for R_class1
         beta: float — rarity threshold for R_class2
+        directed: None — count directed transitions, return undirected graphs (the original behaviour)
+                  True — count directed transitions, return nx.DiGraph
+                  False — count u -> v and v -> u as one edge, return nx.Graph
+        weighted: bool — support is the sum of the edges' `weight` attribute (repeat
+                  counts) instead of the number of graphs, so alpha/beta bound the
+                  mean number of repeats per graph
 
     Returns:
         G_discriminative: nx.Graph — subgraph with discriminative edges representing recovery-promoting actions
         G_to_avoid: nx.Graph — subgraph with edges representing harmful actions to avoid
     """
     if len(R_class1) == 0 or len(R_class2) == 0:
-        print("One of the classes has no graphs. Cannot compute discriminative subgraph.")
-        return nx.Graph(), nx.Graph()
+        log.warning("One of the classes has no graphs. Cannot compute discriminative subgraph.")
+        return _empty(directed)
+
+    instrument.count("graphs", len(R_class1) + len(R_class2))
+    support = graph_support(R_class1, R_class2, directed=directed is not False, weight="weight" if weighted else None)
+    return _discriminative_graphs(support.weighted() if weighted else support, alpha, beta, directed)
+
+
+def _empty(directed):
+    graph_type = nx.DiGraph if directed else nx.Graph
+    return graph_type(), graph_type()
+
 
-    # count edges in R_class1 (Recovery/Survival Class)
-    candidate_edges = {}
-    for g in R_class1:
-        for edge in g.edges():
-            edge = tuple(edge)  # normalize edge direction
-            candidate_edges[edge] = candidate_edges.get(edge, 0) + 1
+def _discriminative_graphs(support, alpha, beta, directed=None):
+    # support rows: 0 = R_class1 (recovery/survival), 1 = R_class2 (death)
+    counts1, counts2 = support.counts
+    freq1, freq2 = support.frequency()
+    total_class1 = support.totals[0]
 
     # select frequent edges in R_class1
-    total_class1 = len(R_class1)
-    frequent_edges = {
-        edge for edge, count in candidate_edges.items()
-        if (count / total_class1) >= alpha
-    }
-    print("Total graphs in class1 (Recovery):", total_class1)
-    print("Total unique edges found:", len(candidate_edges))    
-    # print("Sample of counted edges (with frequency):")
-    # for edge, count in list(candidate_edges.items())[:10]:
-    #     print(edge, "→", count)
+    frequent_edges = (counts1 > 0) & (freq1 >= alpha)
+    log.info("Total graphs in class1 (Recovery): %s", total_class1)
+    log.info("Total unique edges found: %s", int((counts1 > 0).sum()))
 
     # filter out edges that are also common in R_class2 (Death Class)
-    rare_edges = set()
-    for edge in frequent_edges:
-        count = 0
-        for g in R_class2:
-            if g.has_edge(*edge):
-                count += 1
-        if (count / len(R_class2)) <= beta:
-            rare_edges.add(edge)
-
-    # Now let's find harmful actions or edges directly from R_class2 (Death class)
-    death_edge_counts = {}
-    for g in R_class2:
-        for edge in g.edges():
-            edge = tuple(edge)  # normalize edge direction
-            death_edge_counts[edge] = death_edge_counts.get(edge, 0) + 1
+    rare_edges = frequent_edges & (freq2 <= beta)
 
     # select frequent (harmful) edges in R_class2
-    harmful_edges = {
-        edge for edge, count in death_edge_counts.items()
-        if (count / len(R_class2)) >= beta
-    }
+    harmful_edges = (counts2 > 0) & (freq2 >= beta)
 
     # Create discriminative graph for recovery-promoting actions
-    G_discriminative = nx.Graph()
-    G_discriminative.add_edges_from(rare_edges)
+    G_discriminative, G_to_avoid = _empty(directed)
+    G_discriminative.add_edges_from(support.edges(rare_edges))
 
     # Create graph for harmful actions to avoid
-    G_to_avoid = nx.Graph()
-    G_to_avoid.add_edges_from(harmful_edges)
+    G_to_avoid.add_edges_from(support.edges(harmful_edges))
 
-    print("Frequent edges (R_class1 - Recovery):", len(frequent_edges))
-    print("Rare edges (after filtering R_class2 - Recovery Promoting):", len(rare_edges))
-    # print("Harmful edges (from R_class2 - To Avoid):", len(harmful_edges))
+    log.info("Frequent edges (R_class1 - Recovery): %s", int(frequent_edges.sum()))
+    log.info("Rare edges (after filtering R_class2 - Recovery Promoting): %s", int(rare_edges.sum()))
+    log.debug("Harmful edges (from R_class2 - To Avoid): %s", int(harmful_edges.sum()))
+    instrument.count("candidate_edges", len(support))
+    instrument.count("frequent_edges", frequent_edges.sum())
+    instrument.count("rare_edges", rare_edges.sum())
+    instrument.count("harmful_edges", harmful_edges.sum())
 
-    if len(rare_edges) == 0:
-        print("No discriminative edges found for recovery-promoting actions — try lowering alpha or increasing beta.")
-        
-    # if len(harmful_edges) == 0:
-    #     print("No harmful edges found for actions to avoid.")
+    if not rare_edges.any():
+        log.info("No discriminative edges found for recovery-promoting actions — try lowering alpha or increasing beta.")
 
     return G_discriminative, G_to_avoid
 
+
+def find_discriminative_graph_from_corpus(corpus, class1_groups, class2_groups, alpha=0.005, beta=0.5,
+                                          directed=None, weighted=False):
+    """
+    Same as find_discriminative_graph, but reads the class graphs straight from a Corpus.
+
+    Parameters:
+        corpus: Corpus — integer-encoded transition corpus
+        class1_groups: array of group ids (or boolean mask) for the first class
+        class2_groups: array of group ids (or boolean mask) for the second class
+        alpha: float — frequency threshold for class 1
+        beta: float — rarity threshold for class 2
+        directed, weighted: edge semantics, as in find_discriminative_graph (the
+                            weight of an edge is its number of transitions)
+    """
+    class1_groups = corpus.group_ids(class1_groups)
+    class2_groups = corpus.group_ids(class2_groups)
+    if len(class1_groups) == 0 or len(class2_groups) == 0:
+        log.warning("One of the classes has no graphs. Cannot compute discriminative subgraph.")
+        return _empty(directed)
+
+    instrument.count("graphs", len(class1_groups) + len(class2_groups))
+    support = corpus_support(corpus, class1_groups, class2_groups, directed=directed is not False)
+    return _discriminative_graphs(support.weighted() if weighted else support, alpha, beta, directed)
+
+
+class MultiClassDSM:
+    """
+    Discriminative graphs between any classes of graphs, from one class x edge
+    support table counted in a single pass.
+
+    pair(a, b) is find_discriminative_graph(class a, class b) and
+    one_vs_rest(a) compares class a with every other graph; both only slice
+    the shared table. pair_counts() gives the number of discriminative edges of
+    every ordered pair at once.
+
+    Attributes:
+        classes: list — class labels (tuples when several label columns are combined)
+        support: EdgeSupport — class x edge support, rows in `classes` order
+    """
+
+    def __init__(self, support, classes, alpha=0.005, beta=0.5, directed=None):
+        self.support = support
+        self.classes = list(classes)
+        self.index = {c: i for i, c in enumerate(self.classes)}
+        self.alpha = alpha
+        self.beta = beta
+        self.directed = directed
+
+    def __repr__(self):
+        return f"MultiClassDSM(classes={len(self.classes)}, edges={len(self.support)})"
+
+    def _view(self, counts, totals):
+        s = self.support
+        return EdgeSupport(s.keys, counts, totals, s.codes, directed=s.directed)
+
+    def pair(self, label1, label2):
+        """(G_discriminative, G_to_avoid) of class label1 against class label2."""
+        if label1 not in self.index or label2 not in self.index:
+            log.warning("One of the classes has no graphs. Cannot compute discriminative subgraph.")
+            return _empty(self.directed)
+        rows = [self.index[label1], self.index[label2]]
+        return _discriminative_graphs(self._view(self.support.counts[rows], self.support.totals[rows]),
+                                      self.alpha, self.beta, self.directed)
+
+    def one_vs_rest(self, label):
+        """(G_discriminative, G_to_avoid) of class `label` against every other class."""
+        if label not in self.index or len(self.classes) < 2:
+            log.warning("One of the classes has no graphs. Cannot compute discriminative subgraph.")
+            return _empty(self.directed)
+        i = self.index[label]
+        counts, totals = self.support.counts, self.support.totals
+        view = self._view(np.stack([counts[i], counts.sum(axis=0) - counts[i]]),
+                          np.array([totals[i], totals.sum() - totals[i]]))
+        return _discriminative_graphs(view, self.alpha, self.beta, self.directed)
+
+    def all_pairs(self):
+        return {(a, b): self.pair(a, b) for a in self.classes for b in self.classes if a != b}
+
+    def all_one_vs_rest(self):
+        return {c: self.one_vs_rest(c) for c in self.classes}
+
+    def pair_counts(self):
+        """Class x class matrix: discriminative edges of row class against column class."""
+        counts = self.support.counts
+        freq = self.support.frequency()
+        frequent = ((counts > 0) & (freq >= self.alpha)).astype(np.int64)
+        rare = (freq <= self.beta).astype(np.int64)
+        pairs = frequent @ rare.T
+        np.fill_diagonal(pairs, 0)
+        return pairs
+
+
+def _class_groups(labels):
+    # label rows -> (class labels, member indices per class); a -1 in any column drops the row
+    labels = np.asarray(labels)
+    if labels.ndim == 1:
+        labels = labels[:, None]
+    keep = np.flatnonzero((labels != -1).all(axis=1))
+    # factorize column by column, so labels of any dtype combine as integer rows
+    columns = [np.unique(labels[keep, k], return_inverse=True) for k in range(labels.shape[1])]
+    values = [v.tolist() for v, _ in columns]
+    rows, inverse = np.unique(np.stack([inv.ravel() for _, inv in columns], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    names = [tuple(values[k][v] for k, v in enumerate(row)) for row in rows]
+    names = [n[0] if len(n) == 1 else n for n in names]
+    return names, [keep[inverse == c] for c in range(len(rows))]
+
+
+def find_multiclass_discriminative_graphs(graphs, labels, alpha=0.005, beta=0.5, directed=None, weighted=False):
+    """
+    One-vs-rest and all-pairs discriminative mining over labelled graphs.
+
+    Parameters:
+        graphs: list of nx.Graph — patient graphs
+        labels: per-graph labels, or a graphs x k array to combine several
+                label columns (e.g. label and phase); -1 marks a missing label
+        alpha, beta, directed, weighted: as in find_discriminative_graph
+
+    Returns:
+        MultiClassDSM
+    """
+    classes, members = _class_groups(labels)
+    support = graph_support(*[[graphs[i] for i in m] for m in members], directed=directed is not False,
+                            weight="weight" if weighted else None)
+    instrument.count("graphs", sum(len(m) for m in members))
+    return MultiClassDSM(support.weighted() if weighted else support, classes, alpha, beta, directed)
+
+
+def find_multiclass_discriminative_graphs_from_corpus(corpus, labels="label", groups=None, alpha=0.005, beta=0.5,
+                                                      directed=None, weighted=False):
+    """
+    Same as find_multiclass_discriminative_graphs over corpus groups.
+
+    Parameters:
+        labels: a corpus column name ("label", "mortality", "phase"), a tuple of
+                them to combine, or an array with one label per corpus group
+        groups: groups to mine (default: every group with at least one transition)
+    """
+    groups = corpus.select() if groups is None else corpus.group_ids(groups)
+    if isinstance(labels, str):
+        labels = (labels,)
+    if isinstance(labels, tuple) and all(isinstance(l, str) for l in labels):
+        classes, members = _class_groups(np.stack([getattr(corpus, name)[groups] for name in labels], axis=1))
+        if "phase" in labels:
+            # phase names instead of indices, still in corpus phase order
+            p = labels.index("phase")
+            classes = [corpus.phases[c] if len(labels) == 1 else c[:p] + (corpus.phases[c[p]],) + c[p + 1:]
+                       for c in classes]
+    else:
+        classes, members = _class_groups(np.asarray(labels)[groups])
+    support = corpus_support(corpus, *[groups[m] for m in members], directed=directed is not False)
+    instrument.count("graphs", sum(len(m) for m in members))
+    return MultiClassDSM(support.weighted() if weighted else support, classes, alpha, beta, directed)
@@ -0,0 +1,192 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from corpus import edge_keys
+
+
+class PatternFeatures:
+    """
+    Patients x patterns sparse matrix over a Corpus, directly usable by sklearn.
+
+    Columns are every edge of the selected groups plus the given path patterns
+    (tuples of three or more codes, matched on consecutive transitions as in
+    sube.PathIndex). Cells hold 1 where the pattern occurs in the patient graph,
+    or the number of occurrences with counts=True, which for edges is the
+    `weight` build_patient_graphs puts on them. With directed=False, edge
+    columns are unordered code pairs (u, v) with u before v in the code table,
+    matching the undirected graphs returned by the DSM.
+
+    Attributes:
+        matrix: scipy.sparse.csr_matrix — len(groups) x len(patterns)
+        patterns: list of tuple — column labels
+        groups: np.ndarray[int64] — corpus group id of every row
+    """
+
+    def __init__(self, matrix, patterns, groups, directed=True):
+        self.matrix = matrix
+        self.patterns = patterns
+        self.groups = groups
+        self.directed = directed
+        self.column = {tuple(str(c) for c in p): i for i, p in enumerate(patterns)}
+
+    def __repr__(self):
+        return f"PatternFeatures(patients={self.matrix.shape[0]}, patterns={self.matrix.shape[1]})"
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @classmethod
+    def from_corpus(cls, corpus, groups=None, paths=(), counts=False, directed=True):
+        groups = corpus.group_ids(groups)
+        pos, owner = corpus.transition_index(groups)
+        row_of_group = np.zeros(len(corpus), dtype=np.int64)
+        row_of_group[groups] = np.arange(len(groups))
+        rows = row_of_group[owner]
+
+        src, dst = corpus.src[pos].astype(np.int64), corpus.dst[pos].astype(np.int64)
+        if not directed:
+            src, dst = np.minimum(src, dst), np.maximum(src, dst)
+        keys = edge_keys(src, dst, corpus.n_codes)
+        vocab, edge_cols = np.unique(keys, return_inverse=True)
+        patterns = corpus.decode_keys(vocab)
+
+        path_patterns = [tuple(p) for p in paths if len(p) > 2]
+        path_rows, path_cols = _path_occurrences(corpus, pos, rows, path_patterns)
+        patterns += path_patterns
+
+        matrix = csr_matrix(
+            (np.ones(len(edge_cols) + len(path_cols), dtype=np.int64),
+             (np.concatenate([rows, path_rows]), np.concatenate([edge_cols, path_cols + len(vocab)]))),
+            shape=(len(groups), len(patterns)))
+        matrix.sum_duplicates()
+        if not counts:
+            matrix.data[:] = 1
+        return cls(matrix, patterns, groups, directed)
+
+    def columns(self, patterns, either_direction=False):
+        """
+        Columns of the given patterns that occur in the matrix. With
+        either_direction, edges also match their reverse (for the undirected
+        graphs returned by the DSM).
+        """
+        cols = set()
+        for p in patterns:
+            p = tuple(str(c) for c in p)
+            candidates = [p]
+            if len(p) == 2 and (either_direction or not self.directed):
+                candidates.append(p[::-1])
+            cols.update(self.column[c] for c in candidates if c in self.column)
+        return np.fromiter(sorted(cols), dtype=np.int64, count=len(cols))
+
+
+def _path_occurrences(corpus, pos, rows, patterns):
+    # (row, pattern) of every occurrence of a path pattern, grown one code at a
+    # time through a trie of the patterns' prefixes so each level is one searchsorted
+    if not patterns:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    n = corpus.n_codes
+    encoded = [[corpus.code_index.get(str(c), -1) for c in p] for p in patterns]
+    keys = edge_keys(corpus.src[pos], corpus.dst[pos], n)
+    dst = corpus.dst[pos].astype(np.int64)
+
+    # level 2: trie states are the distinct first edges
+    prefixes = {}
+    for p, codes in enumerate(encoded):
+        if min(codes) >= 0:
+            prefixes.setdefault(len(codes), []).append(p)
+    state_keys = np.unique([codes[0] * n + codes[1] for codes in encoded if min(codes) >= 0])
+    state_of = {k: i for i, k in enumerate(state_keys.tolist())}
+    idx = np.minimum(np.searchsorted(state_keys, keys), max(len(state_keys) - 1, 0))
+    hit = state_keys[idx] == keys if len(state_keys) else np.zeros(len(keys), dtype=bool)
+    starts, states = np.flatnonzero(hit), idx[hit]
+    ends = starts.copy()
+
+    out_rows, out_cols = [], []
+    max_length = max((len(c) for c in encoded), default=0)
+    # trie state id of every pattern prefix, level by level
+    pattern_state = {p: state_of.get(codes[0] * n + codes[1]) for p, codes in enumerate(encoded) if min(codes) >= 0}
+    for length in range(3, max_length + 1):
+        live = [p for p, codes in enumerate(encoded) if p in pattern_state and len(codes) >= length]
+        if not live or len(starts) == 0:
+            break
+        transitions = np.unique([pattern_state[p] * n + encoded[p][length - 1] for p in live])
+        next_state = {k: i for i, k in enumerate(transitions.tolist())}
+        for p in live:
+            pattern_state[p] = next_state[pattern_state[p] * n + encoded[p][length - 1]]
+        for p in list(pattern_state):
+            if len(encoded[p]) < length:
+                del pattern_state[p]
+
+        # extend every partial match by the next transition of the same patient
+        nxt = ends + 1
+        ok = nxt < len(keys)
+        ok[ok] &= rows[nxt[ok]] == rows[ends[ok]]
+        starts, states, ends = starts[ok], states[ok], nxt[ok]
+        step = states * n + dst[ends]
+        idx = np.minimum(np.searchsorted(transitions, step), len(transitions) - 1)
+        hit = transitions[idx] == step
+        starts, states, ends = starts[hit], idx[hit], ends[hit]
+
+        # patterns ending at this level
+        terminal = {pattern_state[p]: p for p in prefixes.get(length, ())}
+        if terminal:
+            term_states = np.fromiter(terminal, dtype=np.int64, count=len(terminal))
+            term_patterns = np.fromiter(terminal.values(), dtype=np.int64, count=len(terminal))
+            order = np.argsort(term_states)
+            term_states, term_patterns = term_states[order], term_patterns[order]
+            j = np.minimum(np.searchsorted(term_states, states), len(term_states) - 1)
+            done = term_states[j] == states
+            out_rows.append(rows[starts[done]])
+            out_cols.append(term_patterns[j[done]])
+
+    if not out_rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(out_rows), np.concatenate(out_cols)
+
+
+class PatternScorer:
+    """
+    Linear mortality scorer over PatternFeatures: score = X @ weights + bias,
+    predicting death where the score is positive. Scoring every patient of a
+    phase is one sparse mat-vec.
+    """
+
+    def __init__(self, weights, bias=0.0):
+        self.weights = np.asarray(weights, dtype=float)
+        self.bias = float(bias)
+
+    @classmethod
+    def from_patterns(cls, features, do_patterns=(), avoid_patterns=(), do_weight=-1.0, avoid_weight=1.0, bias=0.0):
+        """Fixed weights: recovery-promoting patterns count against death, patterns to avoid for it."""
+        weights = np.zeros(features.shape[1])
+        for patterns, weight in ((do_patterns, do_weight), (avoid_patterns, avoid_weight)):
+            weights[features.columns(patterns, either_direction=True)] += weight
+        return cls(weights, bias)
+
+    @classmethod
+    def fit(cls, features, y, patterns=None, smoothing=0.5):
+        """
+        Naive-Bayes style weights from labelled rows: the smoothed log odds ratio
+        of each pattern's presence between the dead (y = 1) and alive rows,
+        restricted to `patterns` (e.g. the mined do/avoid patterns) if given.
+        """
+        y = np.asarray(y)
+        X = features.matrix.astype(bool).astype(np.float64)
+        n_dead, n_alive = int((y == 1).sum()), int((y == 0).sum())
+        dead = X.T @ (y == 1).astype(float)
+        alive = X.T @ (y == 0).astype(float)
+        weights = (np.log((dead + smoothing) / (n_dead - dead + smoothing))
+                   - np.log((alive + smoothing) / (n_alive - alive + smoothing)))
+        if patterns is not None:
+            mask = np.zeros(features.shape[1], dtype=bool)
+            mask[features.columns(patterns, either_direction=True)] = True
+            weights[~mask] = 0.0
+        return cls(weights, np.log((n_dead + smoothing) / (n_alive + smoothing)))
+
+    def score(self, features):
+        X = features.matrix if hasattr(features, "matrix") else features
+        return X @ self.weights + self.bias
+
+    def predict(self, features):
+        return (self.score(features) > 0).astype(int)
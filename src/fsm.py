@@ -1,18 +1,72 @@
-from collections import defaultdict
+import numpy as np
+
+from support import graph_support, corpus_support
+import instrument
+
+
+class SupportRanking:
+    """
+    Patterns sorted by descending support. The patterns frequent at any τ form a
+    prefix of the ranking, so every threshold (or top-k) is a slice of one count.
+    """
+
+    def __init__(self, patterns, support):
+        support = np.asarray(support, dtype=np.int64)
+        order = np.argsort(-support, kind="stable")
+        self.patterns = [patterns[i] for i in order]
+        self.support = support[order]
+
+    @classmethod
+    def from_counts(cls, counts):
+        # counts: dict mapping pattern -> support, e.g. from sube.mine_paths()
+        return cls(list(counts), list(counts.values()))
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def __iter__(self):
+        return iter(zip(self.patterns, self.support.tolist()))
+
+    def count(self, τ):
+        # number of patterns with support >= τ
+        return int(np.searchsorted(-self.support, -τ, side="right"))
+
+    def at(self, τ):
+        return set(self.patterns[:self.count(τ)])
+
+    def sweep(self, τ_values):
+        return {τ: self.at(τ) for τ in τ_values}
+
+    def top(self, k):
+        return list(zip(self.patterns[:k], self.support[:k].tolist()))
+
 
 def fsm(G, τ):
-    freq = defaultdict(int)
+    # a list of thresholds is answered from one ranking
+    if isinstance(τ, (list, tuple)):
+        return fsm_ranked(G).sweep(τ)
 
-    # count frequency of each edge
-    for graph in G:
-        for edge in graph:
-            edge = (str(edge[0]), str(edge[1]))  # Ensure each edge is a tuple of strings
-            freq[edge] += 1
+    # count frequency of each edge (every occurrence, edges compared as strings)
+    support = graph_support(G, distinct=False, node_key=str)
 
     # keep only frequent edges
-    fEdges = set()
-    for edge, count in freq.items():
-        if count >= τ:
-            fEdges.add(edge)
+    return set(support.edges(support.counts[0] >= τ))
+
+
+def fsm_ranked(G):
+    support = graph_support(G, distinct=False, node_key=str)
+    return SupportRanking(support.edges(), support.counts[0])
+
+
+def fsm_from_corpus(corpus, τ, groups=None):
+    # same occurrence counting as fsm(), over the integer-encoded corpus
+    if isinstance(τ, (list, tuple)):
+        return fsm_ranked_from_corpus(corpus, groups).sweep(τ)
+    support = corpus_support(corpus, corpus.group_ids(groups), distinct=False)
+    return set(support.edges(support.counts[0] >= τ))
+
 
-    return fEdges
\ No newline at end of file
+def fsm_ranked_from_corpus(corpus, groups=None):
+    support = corpus_support(corpus, corpus.group_ids(groups), distinct=False)
+    instrument.count("candidate_edges", len(support))
+    return SupportRanking(support.edges(), support.counts[0])
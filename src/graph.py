@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class Graph:
     def __init__(self, nodes):
         self.nodes = set(nodes)
@@ -9,25 +12,282 @@ class Graph:
 
     def __repr__(self):
         return f"Graph(nodes={self.nodes}, edges={self.edges})"
-    
-def find_subgraphs(graphs):
-        subgraphs = []
-
-        for graph in graphs:
-            visited = set()
-
-            def dfs(node, component):
-                visited.add(node)
-                component.add(node)
-                for neighbor in graph.edges[node]:
-                    if neighbor not in visited:
-                        dfs(neighbor, component)
-
-            for node in graph.nodes:
-                if node not in visited:
-                    component = set()
-                    dfs(node, component)
-                    subgraphs.append(component)
-
-        return subgraphs
-    
+
+class PatientGraph:
+    """
+    Compact graph of one patient's ICD transitions.
+
+    Edges are stored as a sorted run of int64 keys (src * n_codes + dst over a
+    code table shared by every graph) with a parallel weight run counting how
+    often the transition occurred. Graphs built together share one key and one
+    weight array and only hold their [lo, hi) bounds into them, so a graph costs
+    a slotted object instead of networkx's nested dicts. Undirected graphs store
+    each edge once, from the lower to the higher code id.
+
+    Supports the parts of the networkx API the miners use (edges(), has_edge,
+    neighbors, nodes), so it can be passed to find_discriminative_graph,
+    find_harmful_edges and evaluate_accuracy directly; use to_networkx() for plotting.
+    """
+
+    __slots__ = ("codes", "code_index", "_keys", "_weight", "_lo", "_hi", "directed")
+
+    def __init__(self, codes, code_index, keys, weight, directed=True, lo=0, hi=None):
+        self.codes = codes
+        self.code_index = code_index
+        self._keys = keys
+        self._weight = weight
+        self._lo = lo
+        self._hi = len(keys) if hi is None else hi
+        self.directed = directed
+
+    @property
+    def keys(self):
+        return self._keys[self._lo:self._hi]
+
+    @property
+    def weight(self):
+        return self._weight[self._lo:self._hi]
+
+    @classmethod
+    def from_transitions(cls, codes, code_index, src, dst, directed=True):
+        """Build from code id arrays in visit order; repeated transitions add to the weight."""
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        if not directed:
+            src, dst = np.minimum(src, dst), np.maximum(src, dst)
+        keys, weight = np.unique(src * len(codes) + dst, return_counts=True)
+        return cls(codes, code_index, keys, weight.astype(np.int32), directed)
+
+    def __len__(self):
+        return len(self.nodes())
+
+    def __repr__(self):
+        return f"PatientGraph(nodes={len(self)}, edges={self._hi - self._lo}, directed={self.directed})"
+
+    def is_directed(self):
+        return self.directed
+
+    def number_of_edges(self):
+        return self._hi - self._lo
+
+    def _ends(self):
+        n = len(self.codes)
+        return self.keys // n, self.keys % n
+
+    def nodes(self):
+        src, dst = self._ends()
+        return list(self.codes[np.unique(np.concatenate([src, dst]))])
+
+    def edges(self, data=False, default=None):
+        """
+        (u, v) pairs in key order. As in networkx, data=True adds the attribute
+        dict ({"weight": w}) and data=<name> adds that attribute's value
+        (`default` for any attribute but "weight").
+        """
+        src, dst = self._ends()
+        if data is False:
+            return list(zip(self.codes[src], self.codes[dst]))
+        if data is True:
+            values = [{"weight": w} for w in self.weight.tolist()]
+        elif data == "weight":
+            values = self.weight.tolist()
+        else:
+            values = [default] * len(src)
+        return list(zip(self.codes[src], self.codes[dst], values))
+
+    def _key(self, u, v):
+        i, j = self.code_index.get(u), self.code_index.get(v)
+        if i is None or j is None:
+            return None
+        if not self.directed and i > j:
+            i, j = j, i
+        return i * len(self.codes) + j
+
+    def _find(self, u, v):
+        key = self._key(u, v)
+        if key is None:
+            return None
+        i = self._lo + int(np.searchsorted(self.keys, key))
+        return i if i < self._hi and self._keys[i] == key else None
+
+    def has_edge(self, u, v):
+        return self._find(u, v) is not None
+
+    def get_weight(self, u, v, default=0):
+        i = self._find(u, v)
+        return default if i is None else int(self._weight[i])
+
+    def neighbors(self, u):
+        """Successors of u (every adjacent node if undirected), in code id order."""
+        i = self.code_index.get(u)
+        if i is None:
+            return iter(())
+        src, dst = self._ends()
+        found = dst[src == i]
+        if not self.directed:
+            found = np.union1d(found, src[dst == i])
+        return iter(self.codes[found])
+
+    def to_networkx(self):
+        import networkx as nx
+
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        for u, v, w in self.edges(data="weight"):
+            G.add_edge(u, v, weight=w)
+        return G
+
+
+def patient_graphs(codes, src, dst, offsets, directed=True, code_index=None):
+    """
+    One PatientGraph per CSR group of transitions (group i is
+    src[offsets[i]:offsets[i + 1]] -> dst[...]), sharing one code table.
+    """
+    codes = np.asarray(codes, dtype=object)
+    if code_index is None:
+        code_index = {c: i for i, c in enumerate(codes)}
+    src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if not directed:
+        src, dst = np.minimum(src, dst), np.maximum(src, dst)
+    keys = src * len(codes) + dst
+    owner = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+    # distinct (group, edge) pairs with their transition counts, grouped by graph
+    order = np.lexsort((keys, owner))
+    keys, owner = keys[order], owner[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (owner[1:] != owner[:-1]) | (keys[1:] != keys[:-1])
+    starts = np.flatnonzero(first)
+    weight = np.diff(np.append(starts, len(keys))).astype(np.int32)
+    keys, owner = keys[starts], owner[starts]
+    bounds = np.searchsorted(owner, np.arange(len(offsets)))
+    return [PatientGraph(codes, code_index, keys, weight, directed, lo, hi)
+            for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+
+
+def _dense(labels):
+    # renumber component labels 0..k-1 in order of each component's first node
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(len(first))
+    return rank[inverse]
+
+
+def _weak_components(src, dst, n_nodes):
+    # array-based union-find: hook every root onto the smallest root it is linked
+    # to, then compress paths by pointer jumping, until no edge joins two roots
+    parent = np.arange(n_nodes, dtype=np.int64)
+    while True:
+        ps, pd = parent[src], parent[dst]
+        link = ps != pd
+        if not link.any():
+            return parent
+        np.minimum.at(parent, np.maximum(ps, pd)[link], np.minimum(ps, pd)[link])
+        while True:
+            grand = parent[parent]
+            if (grand == parent).all():
+                break
+            parent = grand
+
+
+def _strong_components(src, dst, n_nodes):
+    # iterative Tarjan over a CSR adjacency, so long chains cannot hit the recursion limit
+    order = np.argsort(src, kind="stable")
+    indices = dst[order].tolist()
+    indptr = np.searchsorted(src[order], np.arange(n_nodes + 1)).tolist()
+    index, low = [-1] * n_nodes, [0] * n_nodes
+    on_stack = [False] * n_nodes
+    labels = [-1] * n_nodes
+    stack, counter, component = [], 0, 0
+    for root in range(n_nodes):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [[root, indptr[root]]]
+        while work:
+            frame = work[-1]
+            v, i = frame
+            if i < indptr[v + 1]:
+                frame[1] = i + 1
+                w = indices[i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append([w, indptr[w]])
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    labels[w] = component
+                    if w == v:
+                        break
+                component += 1
+    return np.asarray(labels, dtype=np.int64)
+
+
+def connected_components(src, dst, n_nodes, strong=False):
+    """
+    Component label of every node 0..n_nodes-1 of the graph with edges src -> dst.
+
+    Weakly connected components ignore edge direction; strongly connected
+    components (strong=True) follow it. Labels are 0..k-1, numbered in order
+    of each component's lowest node id.
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    labels = _strong_components(src, dst, n_nodes) if strong else _weak_components(src, dst, n_nodes)
+    return _dense(labels)
+
+
+def _graph_nodes_and_edges(graph):
+    if isinstance(graph, Graph):
+        return list(graph.nodes), [(u, v) for u, adj in graph.edges.items() for v in adj]
+    if hasattr(graph, "edges"):
+        edges = list(graph.edges())
+        return list(graph.nodes()), edges
+    edges = list(graph)
+    return list(dict.fromkeys(n for e in edges for n in e)), edges
+
+
+def graph_components(graphs, strong=False):
+    """
+    Components of many graphs in one pass over their disjoint union.
+
+    Accepts Graph, PatientGraph, networkx graphs or edge lists. Graph edges are
+    symmetric, so its weak and strong components coincide.
+
+    Returns:
+        (nodes, graph, labels): node labels, the graph index of every node and
+        its component label; labels are numbered across all graphs, graph by graph
+    """
+    nodes, graph_of_node, src, dst = [], [], [], []
+    for g, graph in enumerate(graphs):
+        graph_nodes, edges = _graph_nodes_and_edges(graph)
+        index = {node: len(nodes) + i for i, node in enumerate(graph_nodes)}
+        nodes += graph_nodes
+        graph_of_node += [g] * len(graph_nodes)
+        for u, v in edges:
+            src.append(index[u])
+            dst.append(index[v])
+    labels = connected_components(src, dst, len(nodes), strong)
+    return nodes, np.asarray(graph_of_node, dtype=np.int64), labels
+
+
+def find_subgraphs(graphs, strong=False):
+    """Node set of every connected component of every graph, graph by graph."""
+    nodes, _, labels = graph_components(graphs, strong)
+    subgraphs = [set() for _ in range(labels.max() + 1 if len(labels) else 0)]
+    for node, label in zip(nodes, labels.tolist()):
+        subgraphs[label].add(node)
+    return subgraphs
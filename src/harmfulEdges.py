@@ -1,24 +1,26 @@
-from collections import Counter
+from support import graph_support, corpus_support
+import instrument
 
 def find_frequent_edges(graphs, min_support):
-    edge_counter = Counter()
-    for g in graphs:
-        edge_counter.update(g.edges())
-    return {e for e, count in edge_counter.items() if count >= min_support}
+    support = graph_support(graphs)
+    return set(support.edges(support.counts[0] >= min_support))
 
-def find_harmful_edges(dead_graphs, alive_graphs, min_support_dead=10, max_support_alive=2):
-    dead_counts = Counter()
-    alive_counts = Counter()
+def _harmful(support, min_support_dead, max_support_alive):
+    # support rows: 0 = dead, 1 = alive
+    dead, alive = support.counts
+    harmful = (dead > 0) & (dead >= min_support_dead) & (alive <= max_support_alive)
+    instrument.count("candidate_edges", len(support))
+    instrument.count("harmful_edges", harmful.sum())
+    return support.edges(harmful)
 
-    for g in dead_graphs:
-        dead_counts.update(tuple(e) for e in g.edges())
+def find_harmful_edges(dead_graphs, alive_graphs, min_support_dead=10, max_support_alive=2, directed=True, weighted=False):
+    # directed=False merges u -> v and v -> u (reported as one orientation);
+    # weighted=True thresholds the summed `weight` attribute instead of graph counts
+    support = graph_support(dead_graphs, alive_graphs, directed=directed, weight="weight" if weighted else None)
+    return _harmful(support.weighted() if weighted else support, min_support_dead, max_support_alive)
 
-    for g in alive_graphs:
-        alive_counts.update(tuple(e) for e in g.edges())
 
-    harmful = []
-    for edge, dead_freq in dead_counts.items():
-        if dead_freq >= min_support_dead and alive_counts[edge] <= max_support_alive:
-            harmful.append(edge)
-
-    return harmful
\ No newline at end of file
+def find_harmful_edges_from_corpus(corpus, dead_groups, alive_groups, min_support_dead=10, max_support_alive=2,
+                                   directed=True, weighted=False):
+    support = corpus_support(corpus, dead_groups, alive_groups, directed=directed)
+    return _harmful(support.weighted() if weighted else support, min_support_dead, max_support_alive)
@@ -0,0 +1,169 @@
+import math
+from collections import namedtuple
+
+import networkx as nx
+
+# edges that entered / left one of the result sets since the previous refresh()
+StatusChange = namedtuple("StatusChange", ["added", "removed"])
+
+KINDS = ("discriminative", "avoid", "harmful")
+
+
+class IncrementalDSM:
+    """
+    Online version of find_discriminative_graph() and find_harmful_edges() for a
+    population that changes one patient graph at a time.
+
+    Per-class graph-level edge support is kept in counters that add/remove/relabel
+    events update in time proportional to the size of the graph. refresh() then
+    re-evaluates only the edges that may have changed status: edges touched by
+    the events since the last refresh, plus edges whose support lies between the
+    old and new α/β thresholds (the class totals moved them). Edges are kept in
+    per-class count buckets so that band is found without scanning every edge.
+
+    Classes follow the mortality column: 0 = alive (R_class1, recovery),
+    1 = dead (R_class2). The result sets match the batch functions on the same
+    population:
+        discriminative: frequent in class 0 (freq >= alpha) and rare in class 1 (freq <= beta)
+        avoid: frequent in class 1 (freq >= beta), the G_to_avoid graph
+        harmful: dead support >= min_support_dead and alive support <= max_support_alive
+    """
+
+    def __init__(self, alpha=0.005, beta=0.5, min_support_dead=10, max_support_alive=2):
+        self.alpha = alpha
+        self.beta = beta
+        self.min_support_dead = min_support_dead
+        self.max_support_alive = max_support_alive
+        self.counts = {}            # edge -> [alive support, dead support]
+        self.totals = [0, 0]        # graphs per class
+        self.buckets = ({}, {})     # per class: support -> set of edges with that support
+        self.patients = {}          # patient id -> (class, frozenset of edges)
+        self.result = {kind: set() for kind in KINDS}
+        self._touched = set()
+        self._refreshed_totals = [0, 0]
+
+    def __len__(self):
+        return len(self.patients)
+
+    def __repr__(self):
+        return (f"IncrementalDSM(patients={len(self.patients)}, edges={len(self.counts)}, "
+                + ", ".join(f"{kind}={len(self.result[kind])}" for kind in KINDS) + ")")
+
+    @classmethod
+    def from_corpus(cls, corpus, groups=None, **params):
+        """Miner seeded with corpus groups, keyed by group id and classed by mortality."""
+        miner = cls(**params)
+        for i in corpus.group_ids(groups):
+            if corpus.mortality[i] in (0, 1):
+                miner.add(int(i), corpus.edges(i), int(corpus.mortality[i]))
+        miner.refresh()
+        return miner
+
+    # ========== EVENTS ==========
+    def _shift(self, edge, cls, delta):
+        counts = self.counts.setdefault(edge, [0, 0])
+        bucket = self.buckets[cls]
+        old = counts[cls]
+        if old:
+            bucket[old].discard(edge)
+            if not bucket[old]:
+                del bucket[old]
+        counts[cls] = old + delta
+        if counts[cls]:
+            bucket.setdefault(counts[cls], set()).add(edge)
+        elif not counts[1 - cls]:
+            del self.counts[edge]
+        self._touched.add(edge)
+
+    def _count(self, edges, cls, delta):
+        for edge in edges:
+            self._shift(edge, cls, delta)
+        self.totals[cls] += delta
+
+    def add(self, patient, graph, cls):
+        """Add a patient graph (nx graph or list of edges) to class `cls`."""
+        if patient in self.patients:
+            raise KeyError(f"patient {patient!r} is already present; remove or relabel it")
+        edges = frozenset(graph.edges() if hasattr(graph, "edges") else graph)
+        self.patients[patient] = (cls, edges)
+        self._count(edges, cls, 1)
+
+    def remove(self, patient):
+        cls, edges = self.patients.pop(patient)
+        self._count(edges, cls, -1)
+
+    def relabel(self, patient, cls):
+        """Move a patient to another class, e.g. from alive to dead."""
+        old, edges = self.patients[patient]
+        if old == cls:
+            return
+        self._count(edges, old, -1)
+        self._count(edges, cls, 1)
+        self.patients[patient] = (cls, edges)
+
+    def apply(self, events):
+        """
+        Apply a batch of events and refresh. Events are tuples
+        ("add", patient, graph, cls), ("remove", patient) or ("relabel", patient, cls).
+        """
+        handlers = {"add": self.add, "remove": self.remove, "relabel": self.relabel}
+        for kind, *args in events:
+            handlers[kind](*args)
+        return self.refresh()
+
+    # ========== STATUS ==========
+    def _status(self, edge):
+        alive, dead = self.counts.get(edge, (0, 0))
+        n_alive, n_dead = max(self.totals[0], 1), max(self.totals[1], 1)
+        frequent = alive > 0 and alive / n_alive >= self.alpha
+        return {
+            "discriminative": frequent and dead / n_dead <= self.beta,
+            "avoid": dead > 0 and dead / n_dead >= self.beta,
+            "harmful": dead > 0 and dead >= self.min_support_dead and alive <= self.max_support_alive,
+        }
+
+    def _band(self, cls, fraction):
+        # edges whose support may compare differently with fraction * total since the last refresh
+        lo, hi = sorted([max(self._refreshed_totals[cls], 1), max(self.totals[cls], 1)])
+        if lo == hi:
+            return
+        bucket = self.buckets[cls]
+        for count in range(max(1, math.floor(fraction * lo)), math.ceil(fraction * hi) + 1):
+            yield from bucket.get(count, ())
+
+    def refresh(self):
+        """
+        Re-evaluate the edges that may have changed status and update the result
+        sets. Returns {kind: StatusChange(added, removed)} for the discriminative,
+        avoid and harmful edges.
+        """
+        candidates = self._touched
+        candidates.update(self._band(0, self.alpha))
+        candidates.update(self._band(1, self.beta))
+
+        changes = {kind: StatusChange(set(), set()) for kind in KINDS}
+        for edge in candidates:
+            for kind, holds in self._status(edge).items():
+                current = self.result[kind]
+                if holds and edge not in current:
+                    current.add(edge)
+                    changes[kind].added.add(edge)
+                elif not holds and edge in current:
+                    current.discard(edge)
+                    changes[kind].removed.add(edge)
+
+        self._touched = set()
+        self._refreshed_totals = list(self.totals)
+        return changes
+
+    # ========== RESULTS ==========
+    def discriminative_graph(self):
+        """(G_discriminative, G_to_avoid) as returned by find_discriminative_graph()."""
+        G_discriminative = nx.Graph()
+        G_discriminative.add_edges_from(self.result["discriminative"])
+        G_to_avoid = nx.Graph()
+        G_to_avoid.add_edges_from(self.result["avoid"])
+        return G_discriminative, G_to_avoid
+
+    def harmful_edges(self):
+        return list(self.result["harmful"])
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from classify import label_codes
+from corpus import corpus_from_frame, concat_corpora
+
+# only the columns the miners use, with compact dtypes instead of Python str objects
+COLUMNS = ["subject_id", "hadm_id", "icd_code", "sequence_num", "phase", "mortality"]
+DTYPES = {
+    "subject_id": "int64",
+    "hadm_id": "int64",
+    "icd_code": "category",
+    "sequence_num": "int32",
+    "phase": "category",
+    "mortality": "float32",
+}
+
+# rough on-disk size of one diagnoses row, used to size the partitions of unsorted input
+ROW_BYTES = 64
+
+TransitionGroup = namedtuple("TransitionGroup", ["subject_id", "hadm_id", "phase", "mortality", "label", "transitions"])
+
+
+def _read_chunks(path, chunksize):
+    return pd.read_csv(path, usecols=COLUMNS, dtype=DTYPES, chunksize=chunksize)
+
+
+def _iter_sorted(path, chunksize):
+    # the last subject of a chunk may continue in the next one, so it is carried over
+    carry = None
+    last_subject = None
+    for chunk in _read_chunks(path, chunksize):
+        subjects = chunk["subject_id"].to_numpy()
+        if len(subjects) == 0:
+            continue
+        if (np.diff(subjects) < 0).any() or (last_subject is not None and subjects[0] < last_subject):
+            raise ValueError(f"{path} is not sorted by subject_id; load it with presorted=False")
+        last_subject = subjects[-1]
+
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        tail = chunk["subject_id"].to_numpy() == last_subject
+        carry = chunk[tail]
+        if not tail.all():
+            yield chunk[~tail]
+    if carry is not None and len(carry):
+        yield carry
+
+
+def _iter_partitioned(path, chunksize):
+    # external grouping for unsorted input: spill rows to subject_id-hashed partition
+    # files, then load one partition (a set of complete subjects) at a time
+    n_partitions = max(1, -(-os.path.getsize(path) // (chunksize * ROW_BYTES)))
+    tmpdir = tempfile.mkdtemp(prefix="ingest_")
+    try:
+        files = [os.path.join(tmpdir, f"part_{i}.csv") for i in range(n_partitions)]
+        for chunk in _read_chunks(path, chunksize):
+            partition = chunk["subject_id"].to_numpy() % n_partitions
+            for i in np.unique(partition):
+                rows = chunk[partition == i]
+                rows.to_csv(files[i], mode="a", header=not os.path.exists(files[i]), index=False)
+        for file in files:
+            if os.path.exists(file):
+                yield pd.read_csv(file, dtype=DTYPES)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def iter_subject_blocks(path, chunksize=1_000_000, presorted=True):
+    """
+    Yield frames of complete subjects while reading at most about `chunksize`
+    rows at a time.
+
+    Parameters:
+        path: str — diagnoses CSV
+        chunksize: int — rows per read
+        presorted: bool — rely on the subject_id ordering of the file (as in the
+                          MIMIC diagnoses table); otherwise partition it on disk first
+    """
+    if presorted:
+        return _iter_sorted(path, chunksize)
+    return _iter_partitioned(path, chunksize)
+
+
+def _block_corpus(block):
+    # ICD labels are derived inline instead of read from (or written to) the file
+    return corpus_from_frame(block.assign(label=label_codes(block["icd_code"])))
+
+
+def iter_transition_groups(path, chunksize=1_000_000, presorted=True):
+    """Stream one TransitionGroup per (subject_id, phase) group of the CSV."""
+    for block in iter_subject_blocks(path, chunksize, presorted):
+        corpus = _block_corpus(block)
+        for i in range(len(corpus)):
+            yield TransitionGroup(
+                subject_id=int(corpus.subject_id[i]),
+                hadm_id=int(corpus.hadm_id[i]),
+                phase=corpus.phases[corpus.phase[i]],
+                mortality=int(corpus.mortality[i]),
+                label=int(corpus.label[i]),
+                transitions=corpus.edges(i),
+            )
+
+
+def load_corpus_chunked(path, chunksize=1_000_000, presorted=True):
+    """Build a Corpus from the CSV one block of complete subjects at a time."""
+    corpus = concat_corpora([_block_corpus(block) for block in iter_subject_blocks(path, chunksize, presorted)])
+    if not presorted:
+        # partitions come back in hash order; restore the (subject, phase) order of load_corpus
+        corpus = corpus.take(np.lexsort((corpus.phase, corpus.subject_id)))
+    return corpus
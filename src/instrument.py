@@ -0,0 +1,145 @@
+import cProfile
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+# instruments receiving stage records, innermost last; stages are no-ops while it is empty
+_instruments = []
+# open stages, innermost last; count() adds to the innermost one
+_stages = []
+
+
+def _max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Instrument:
+    """
+    Collects one record per pipeline stage: wall and CPU seconds, the process
+    peak RSS (ru_maxrss, over the whole process lifetime) when the stage ended
+    and how much the stage raised it, and counters the miners report through
+    count() (graphs built, candidate/frequent/rare/harmful edges, BFS calls,
+    path candidates, ...). Records are appended to a JSON lines file and/or
+    passed to a callback as they are produced, and kept in `records`.
+
+    Parameters:
+        path: str — JSON lines file to append records to
+        callback: callable(record) — called with every record
+        profile: iterable of stage names to run under a profiler, or True for all
+        profile_dir: str — where the profiler output (<stage path>.prof) is written
+        profiler: callable — profiler factory with enable/disable/dump_stats (cProfile by default;
+                  a sampling profiler with the same interface can be plugged in)
+    """
+
+    def __init__(self, path=None, callback=None, profile=(), profile_dir=".", profiler=cProfile.Profile):
+        self.path = path
+        self.callback = callback
+        self.profile = profile if profile is True else set(profile)
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        if self.callback is not None:
+            self.callback(record)
+
+    def profiles(self, name):
+        return self.profile is True or name in self.profile
+
+    def config(self):
+        # picklable settings for a worker process capturing stages on the parent's behalf
+        return self.profile, self.profile_dir
+
+
+@contextmanager
+def using(instrument):
+    """Make `instrument` receive the records of the stages opened inside (None keeps the current one)."""
+    if instrument is None:
+        yield
+        return
+    _instruments.append(instrument)
+    try:
+        yield instrument
+    finally:
+        _instruments.remove(instrument)
+
+
+def active():
+    return _instruments[-1] if _instruments else None
+
+
+@contextmanager
+def stage(name, **tags):
+    """
+    Time a stage and collect the counters reported inside it. Tags (e.g.
+    phase="early") are copied into the record; nested stages are named by
+    their path, e.g. "phase_dsm/dsm".
+    """
+    instrument = active()
+    if instrument is None:
+        yield None
+        return
+    path = f"{_stages[-1]['stage']}/{name}" if _stages else name
+    record = {"stage": path, **tags, "counters": {}}
+    profiler = instrument.profiler() if instrument.profiles(name) else None
+    _stages.append(record)
+    wall, cpu, peak = time.perf_counter(), time.process_time(), _max_rss()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record["wall_s"] = time.perf_counter() - wall
+        record["cpu_s"] = time.process_time() - cpu
+        # ru_maxrss never decreases: the growth is what this stage added to the
+        # process peak (0 when an earlier stage already went higher)
+        record["process_peak_rss_bytes"] = _max_rss()
+        record["peak_rss_growth_bytes"] = record["process_peak_rss_bytes"] - peak
+        record["pid"] = os.getpid()
+        _stages.pop()
+        if profiler is not None:
+            suffix = "".join(f"-{v}" for v in tags.values())
+            record["profile"] = os.path.join(instrument.profile_dir, path.replace("/", ".") + suffix + ".prof")
+            profiler.dump_stats(record["profile"])
+        instrument.emit(record)
+
+
+def count(name, n=1):
+    """Add n to counter `name` of the innermost open stage (no-op outside stages)."""
+    if _stages:
+        counters = _stages[-1]["counters"]
+        counters[name] = counters.get(name, 0) + int(n)
+
+
+@contextmanager
+def capture(config):
+    """Collect the records of the stages opened inside, e.g. in a pool worker."""
+    profile, profile_dir = config
+    instrument = Instrument(profile=profile, profile_dir=profile_dir)
+    # a forked worker inherits the stages open in the parent; forward() re-adds them
+    outer = _stages[:]
+    _stages.clear()
+    try:
+        with using(instrument):
+            yield instrument.records
+    finally:
+        _stages[:] = outer
+
+
+def forward(records):
+    """Re-emit records captured elsewhere as children of the current stage."""
+    instrument = active()
+    if instrument is None:
+        return
+    for record in records:
+        if _stages:
+            record = {**record, "stage": f"{_stages[-1]['stage']}/{record['stage']}"}
+        instrument.emit(record)
@@ -1,200 +1,62 @@
-import pandas as pd
-import networkx as nx
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
-from sklearn.metrics import confusion_matrix, precision_score, recall_score
-
-from fsm import fsm
-from sube import subE
-from graph import Graph, find_subgraphs
-from discgraph import find_discriminative_graph
-from accuracy import evaluate_accuracy
-from harmfulEdges import find_harmful_edges
-from actionAvoid import extract_action_patterns
-
-# ========== DATA LOAD ==========
-df = pd.read_csv("../data/data.csv", dtype=str)
-print("CSV Columns:", df.columns.tolist())
-
-# ========== BASIC CONNECTIVITY TEST ==========
-grouped = df.sort_values(["subject_id", "phase", "sequence_num"]).groupby(["subject_id", "phase"])
-all_edges = []
-for _, group in grouped:
-    diags = list(group["icd_code"])
-    all_edges.extend([(diags[i], diags[i + 1]) for i in range(len(diags) - 1)])
-
-connectivity_graph = nx.DiGraph()
-connectivity_graph.add_edges_from(all_edges)
-plt.figure(figsize=(10, 6))
-nx.draw_kamada_kawai(connectivity_graph, node_size=20, edge_color='gray', alpha=0.5)
-plt.title("Basic ICD Code Connectivity Graph")
-plt.savefig("basic_connectivity.png")
-plt.clf()
-
-# ========== FSM AND SUBE ==========
-τ_values = [1, 2, 3]
-fsm_by_tau = {}
-def convert_to_nx_graph(custom_graph):
-    G = nx.DiGraph()
-    G.add_nodes_from(custom_graph.nodes)
-    for u in custom_graph.edges:
-        for v in custom_graph.edges[u]:
-            G.add_edge(u, v)
-    return G
-
-for tau in τ_values:
-    print(f"\nRunning FSM with τ={tau}")
-    G = []
-    for _, group in grouped:
-        diags = list(group["icd_code"])
-        edges = [(diags[i], diags[i + 1]) for i in range(len(diags) - 1)]
-        G.append(edges)
-    fsm_result = fsm(G, tau)
-    fsm_by_tau[tau] = fsm_result
-    result_sube = set()
-    for edge in fsm_result:
-        result_sube.update(subE(edge, G, tau, fsm_result))
-
-    sg = Graph(set([n for e in fsm_result for n in e]))
-    for u, v in fsm_result:
-        sg.add_edge(u, v)
-    nx.draw_networkx(convert_to_nx_graph(sg))
-    plt.title(f"FSM Patterns (τ={tau})")
-    plt.savefig(f"fsm_tau_{tau}.png")
-    plt.clf()
-
-# ========== CLASS-SPECIFIC GRAPHS ==========
-R_urgent, R_nonurgent, R_chronic, R_alive, R_dead = [], [], [], [], []
-
-for subj_id, group in grouped:
-    diags = list(group["icd_code"])
-    edges = [(diags[i], diags[i + 1]) for i in range(len(diags) - 1)]
-    if not edges: continue
-    g = nx.DiGraph()
-    g.add_edges_from(edges)
-    if int(group["mortality"].iloc[0]) == 0:
-        R_alive.append(g)
-    else:
-        R_dead.append(g)
-    label = int(group["label"].iloc[0])
-    if label == 1: R_urgent.append(g)
-    elif label == 0: R_nonurgent.append(g)
-    elif label == 2: R_chronic.append(g)
-
-print(f"# Urgent: {len(R_urgent)}, Chronic: {len(R_chronic)}, Non-Urgent: {len(R_nonurgent)}")
-
-# ========== TEST: DISCRIMINATIVE PATTERNS ==========
-pairs = [("Urgent", R_urgent, R_chronic), ("Urgent", R_urgent, R_nonurgent), ("Chronic", R_chronic, R_nonurgent)]
-for name1, g1, g2 in pairs:
-    dg, _ = find_discriminative_graph(g1, g2)
-    print(f"\nDiscriminative edges for {name1} vs other:", list(dg.edges()))
-# ========== PHASE-WISE ANALYSIS & METRICS ==========
-recommendations = []
-y_true, y_pred = [], []
-
-for phase in ["early", "middle", "late"]:
-    R_alive_p, R_dead_p = [], []
-    for (subj_id, p), group in grouped:
-        if p != phase:
-            continue
-        diags = list(group["icd_code"])
-        edges = [(diags[i], diags[i + 1]) for i in range(len(diags) - 1)]
-        if not edges:
-            continue
-        g = nx.DiGraph()
-        g.add_edges_from(edges)
-        if int(group["mortality"].iloc[0]) == 0:
-            R_alive_p.append(g)
-        else:
-            R_dead_p.append(g)
-
-    disc_graph, avoid_graph = find_discriminative_graph(R_alive_p, R_dead_p)
-    acc = evaluate_accuracy([disc_graph], R_alive_p, R_dead_p)
-    print(f"\n--- Phase {phase} ---")
-    print(f"# Alive: {len(R_alive_p)}, Dead: {len(R_dead_p)}")
-    print(f"Accuracy: {acc:.2%}")
-
-    harmful = find_harmful_edges(R_dead_p, R_alive_p)
-    print("Harmful Edges Found:", len(harmful))
-
-    # # Find action patterns for avoid actions
-    avoid_patterns = extract_action_patterns(R_dead_p, harmful)
-    if avoid_patterns:
-        print(f"Avoid actions for phase: {phase}")
-        for pattern in avoid_patterns:
-            print(pattern)
-    else:
-        print(f"No avoid actions for phase: {phase}")
-
-    # Record recommendations for recovery and avoid actions
-    for edge in disc_graph.edges():
-        recommendations.append({
-            "phase": phase,
-            "action_type": "do",  # action type is "do" for recovery actions
-            "edge": edge
-        })
-    if len(avoid_graph.edges) > 0:
-        for edge in avoid_graph.edges():
-            recommendations.append({
-                "phase": phase,
-                "action_type": "avoid",  # action type is "avoid" for avoid actions
-                "edge": edge
-            })
-
-    # simulate confusion matrix
-    phase_graphs = R_alive_p + R_dead_p
-    phase_labels = [0] * len(R_alive_p) + [1] * len(R_dead_p)
-    source = list(disc_graph.nodes())[0] if disc_graph.nodes() else None
-    target = list(disc_graph.nodes())[-1] if disc_graph.nodes() else None
-
-    for g, label in zip(phase_graphs, phase_labels):
-        y_true.append(label)
-        if source in g and target in g:
-            y_pred.append(0 if nx.has_path(g, source, target) else 1)
+import argparse
+import logging
+import os
+import sys
+
+from instrument import Instrument
+from pipeline import Pipeline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Phase-wise FSM/DSM recommendation pipeline")
+    parser.add_argument("--data", default="../data/data.csv", help="diagnoses CSV")
+    parser.add_argument("--workers", type=int, default=1, help="processes for the independent phase and class-pair units")
+    parser.add_argument("--chunksize", type=int, default=None, help="stream the CSV in chunks of this many rows")
+    parser.add_argument("--cache-dir", default=None, help="corpus cache directory (default: .corpus_cache next to the data)")
+    parser.add_argument("--render-workers", type=int, default=2, help="background processes rendering figures (0 renders inline)")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the CSV")
+    parser.add_argument("--log-level", default="INFO", help="level of the miners' progress messages (e.g. WARNING to hide them)")
+    parser.add_argument("--metrics", default=None, help="append per-stage timings and counters to this JSON lines file")
+    parser.add_argument("--edges", choices=["mixed", "directed", "undirected"], default="mixed",
+                        help="edge semantics: directed counting with undirected DSM graphs (mixed, the default), or fully (un)directed")
+    parser.add_argument("--weighted", action="store_true", help="support sums transition repeats instead of counting graphs")
+    parser.add_argument("--approximate", type=int, default=None, metavar="CAPACITY",
+                        help="mine the phase DSM and harmful edges with fixed-memory sketches keeping CAPACITY edges per class")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT", help="after the run, answer /recommend queries on this port")
+    parser.add_argument("--sweep", default=None, metavar="CSV", help="write a threshold grid table here instead of running the report")
+    parser.add_argument("--alphas", type=float, nargs="+", default=None, help="sweep values of alpha")
+    parser.add_argument("--betas", type=float, nargs="+", default=None, help="sweep values of beta")
+    parser.add_argument("--min-support-dead", type=int, nargs="+", default=None, help="sweep values of min_support_dead")
+    parser.add_argument("--max-support-alive", type=int, nargs="+", default=None, help="sweep values of max_support_alive")
+    parser.add_argument("--taus", type=int, nargs="+", default=None, help="sweep values of τ")
+    parser.add_argument("--cv", type=int, default=None, metavar="K", help="report subject-grouped K-fold metrics instead of running the report")
+    parser.add_argument("--profile", nargs="*", default=None, help="run these stages (all if none given) under cProfile")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(message)s", stream=sys.stdout)
+    instrument = None
+    if args.metrics is not None or args.profile is not None:
+        profile = () if args.profile is None else (args.profile or True)
+        instrument = Instrument(args.metrics, profile=profile, profile_dir=os.path.dirname(args.metrics or "") or ".")
+
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or os.path.join(os.path.dirname(args.data), ".corpus_cache")
+    with Pipeline(args.data, workers=args.workers, chunksize=args.chunksize, cache_dir=cache_dir,
+                  render_workers=args.render_workers, instrument=instrument,
+                  directed={"mixed": None, "directed": True, "undirected": False}[args.edges], weighted=args.weighted,
+                  approximate=None if args.approximate is None else {"capacity": args.approximate}) as pipeline:
+        if args.cv is not None:
+            result = pipeline.cross_validate(args.cv)
+            print(result.summary.to_string(index=False, float_format="{:.3f}".format))
+        elif args.sweep is not None:
+            table = pipeline.sweep(args.alphas, args.betas, args.min_support_dead, args.max_support_alive, args.taus)
+            table.to_csv(args.sweep, index=False)
+            print(f"{len(table)} grid points written to {args.sweep}")
         else:
-            # fallback if nodes missing (you can change this logic as needed)
-            y_pred.append(1)  # assume mortality if not enough info
-
-    # visualize
-    if disc_graph.number_of_edges() > 0:
-        nx.draw_networkx(disc_graph)
-        plt.title(f"Recovery Actions - {phase}")
-        plt.savefig(f"recovery_{phase}.png")
-        plt.clf()
-
-    if len(avoid_graph.edges()) > 0:
-        nx.draw_networkx(avoid_graph)
-        plt.title(f"Avoid Actions - {phase}")
-        plt.savefig(f"avoid_{phase}.png")
-        plt.clf()
-    else:
-        print(f"No avoid actions for phase: {phase}")
-
-# ========== FINAL METRICS ==========
-print("\n== Predictive Performance Summary ==")
-cm = confusion_matrix(y_true, y_pred)
-print("Confusion Matrix:\n", cm)
-
-prec_recovery = precision_score(y_true, y_pred, pos_label=0)
-recall_recovery = recall_score(y_true, y_pred, pos_label=0)
-
-prec_mortality = precision_score(y_true, y_pred, pos_label=1)
-recall_mortality = recall_score(y_true, y_pred, pos_label=1)
-
-print(f"Recovery Precision: {prec_recovery:.2f}, Recall: {recall_recovery:.2f}")
-print(f"Mortality Precision: {prec_mortality:.2f}, Recall: {recall_mortality:.2f}")
-
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=["Recovered", "Died"], yticklabels=["Recovered", "Died"])
-plt.title("Confusion Matrix")
-plt.xlabel("Predicted")
-plt.ylabel("Actual")
-plt.savefig("confusion_matrix.png")
-plt.clf()
-
-# ========== EXPORT ==========
-rec_df = pd.DataFrame(recommendations)
-rec_df.to_csv("phasewise_recommendations.csv", index=False)
+            pipeline.run()
+        if args.serve is not None:
+            print(f"Serving recommendations on http://127.0.0.1:{args.serve}/recommend")
+            pipeline.serve(port=args.serve)
 
 '''
 import pandas as pd
@@ -1,7 +1,18 @@
+import numpy as np
 import pandas as pd
 import networkx as nx
 
-def build_patient_graphs(df):
+from graph import patient_graphs
+
+def build_patient_graphs(df, compact=False):
+    """
+    Split patients into survivors (R_class1) and deaths (R_class2), one
+    undirected graph per subject weighted by transition counts. With
+    compact=True the graphs are PatientGraph objects instead of nx.Graph.
+    """
+    if compact:
+        return _build_compact_patient_graphs(df)
+
     R_class1 = []
     R_class2 = []
 
@@ -28,4 +39,24 @@ def build_patient_graphs(df):
         else:
             R_class2.append(G)
 
-    return R_class1, R_class2
\ No newline at end of file
+    return R_class1, R_class2
+
+
+def _build_compact_patient_graphs(df):
+    # same grouping and ordering as above, encoded once for all subjects
+    df = df.sort_values(['subject_id', 'sequence_num'], kind='stable')
+    codes, code_ids = np.unique(df['icd_code'].to_numpy(), return_inverse=True)
+    subject = df['subject_id'].to_numpy()
+    start = np.ones(len(df), dtype=bool)
+    start[1:] = subject[1:] != subject[:-1]
+    first_rows = np.flatnonzero(start)
+
+    same = ~start[1:]
+    src, dst = code_ids[:-1][same], code_ids[1:][same]
+    sizes = np.diff(np.append(first_rows, len(df))) - 1
+    graphs = patient_graphs(codes, src, dst, np.concatenate([[0], np.cumsum(sizes)]), directed=False)
+
+    dead = (df['mortality'].to_numpy()[first_rows] != 0)
+    R_class1 = [g for g, d in zip(graphs, dead) if not d]
+    R_class2 = [g for g, d in zip(graphs, dead) if d]
+    return R_class1, R_class2
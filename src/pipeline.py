@@ -0,0 +1,361 @@
+from contextlib import contextmanager
+from functools import cached_property, wraps
+
+import numpy as np
+import networkx as nx
+
+from corpus import load_corpus
+from crossval import cross_validate
+from discgraph import find_multiclass_discriminative_graphs_from_corpus
+from fsm import SupportRanking, fsm_ranked_from_corpus
+from sube import mine_paths_from_corpus
+from graph import Graph
+from recommend import RecommendationIndex, make_server
+from runner import Runner
+from sweep import sweep
+from render import LAYOUT_THRESHOLD, PositionCache, Renderer, render_graph, render_heatmap
+import analysis
+import instrument
+
+PHASES = ["early", "middle", "late"]
+CLASS_PAIRS = [("Urgent", 1, 2), ("Urgent", 1, 0), ("Chronic", 2, 0)]
+
+
+def stage_property(name):
+    """cached_property whose first evaluation is recorded as instrumented stage `name`."""
+    def decorator(fn):
+        @wraps(fn)
+        def evaluate(self):
+            with self._stage(name):
+                return fn(self)
+        return cached_property(evaluate)
+    return decorator
+
+
+def convert_to_nx_graph(custom_graph):
+    G = nx.DiGraph()
+    G.add_nodes_from(custom_graph.nodes)
+    for u in custom_graph.edges:
+        for v in custom_graph.edges[u]:
+            G.add_edge(u, v)
+    return G
+
+
+class Pipeline:
+    """
+    Lazily evaluated FSM/DSM recommendation pipeline.
+
+    Every stage is a property computed on first access and memoized, so asking
+    for e.g. `harmful_edges` only loads the corpus and mines what that stage
+    needs. matplotlib/seaborn are imported only by the plot stages and sklearn
+    only by `metrics`. Stages that run once per phase or class pair go through a
+    Runner, so `workers > 1` spreads them over a process pool. Figures are
+    laid out once per ICD code and rendered by a background Renderer
+    (`render_workers=0` renders inline). With an `instrument`, every stage
+    records its wall/CPU time, peak RSS and the miners' counters (see instrument.py).
+    `directed` and `weighted` select the edge semantics of every DSM, harmful-edge,
+    avoid-pattern, accuracy and prediction stage (see find_discriminative_graph).
+    With `approximate` (a dict of ApproximateSupport settings, e.g. {"capacity": 10000}),
+    the phase DSM and harmful edges are mined in fixed memory (see approx.py).
+
+    Stages: corpus (load), label_groups / phase_groups (label), connectivity_graph
+    (build graphs), fsm / sube (FSM), class_dsm / phase_dsm (DSM), harmful_edges,
+    avoid_patterns, accuracy / predictions / metrics, plots(), recommendations / export(),
+    recommendation_index (index) / serve(), sweep() (threshold grid), cross_validate().
+    """
+
+    def __init__(self, path="../data/data.csv", τ_values=(1, 2, 3), alpha=0.005, beta=0.5,
+                 min_support_dead=10, max_support_alive=2, max_hops=3, max_length=3,
+                 phases=PHASES, class_pairs=CLASS_PAIRS, workers=1, output_dir=".", chunksize=None,
+                 cache_dir=None, render_workers=1, layout_threshold=LAYOUT_THRESHOLD,
+                 instrument=None, directed=None, weighted=False, approximate=None):
+        self.path = path
+        self.τ_values = list(τ_values)
+        self.alpha = alpha
+        self.beta = beta
+        self.min_support_dead = min_support_dead
+        self.max_support_alive = max_support_alive
+        self.max_hops = max_hops
+        self.max_length = max_length
+        self.phases = list(phases)
+        self.class_pairs = list(class_pairs)
+        self.workers = workers
+        self.output_dir = output_dir
+        self.chunksize = chunksize
+        self.cache_dir = cache_dir
+        self.render_workers = render_workers
+        self.layout_threshold = layout_threshold
+        self.instrument = instrument
+        self.directed = directed
+        self.weighted = weighted
+        if approximate is not None and weighted:
+            raise ValueError("approximate support counting is not available for weighted support")
+        self.approximate = approximate
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if "runner" in self.__dict__:
+            self.runner.close()
+        if "renderer" in self.__dict__:
+            self.renderer.close()
+        if "positions" in self.__dict__:
+            self.positions.save()
+
+    @contextmanager
+    def _stage(self, name, **tags):
+        with instrument.using(self.instrument), instrument.stage(name, **tags) as record:
+            yield record
+
+    def _output(self, name):
+        return f"{self.output_dir}/{name}"
+
+    # ========== DATA LOAD ==========
+    @stage_property("load")
+    def corpus(self):
+        corpus = load_corpus(self.path, chunksize=self.chunksize, cache_dir=self.cache_dir)
+        instrument.count("groups", len(corpus))
+        instrument.count("transitions", len(corpus.src))
+        return corpus
+
+    @cached_property
+    def runner(self):
+        return Runner(self.corpus, self.workers)
+
+    # ========== LABELS ==========
+    @stage_property("label")
+    def label_groups(self):
+        return {
+            "Urgent": self.corpus.select(label=1),
+            "Chronic": self.corpus.select(label=2),
+            "Non-Urgent": self.corpus.select(label=0),
+        }
+
+    @stage_property("label")
+    def phase_groups(self):
+        # phase -> (alive group ids, dead group ids)
+        return {p: (self.corpus.select(phase=p, mortality=0), self.corpus.select(phase=p, mortality=1))
+                for p in self.phases}
+
+    # ========== GRAPHS ==========
+    @stage_property("build_graphs")
+    def connectivity_graph(self):
+        connectivity_graph = nx.DiGraph()
+        connectivity_graph.add_edges_from(self.corpus.decode_keys(np.unique(self.corpus.keys)))
+        return connectivity_graph
+
+    # ========== FSM AND SUBE ==========
+    @stage_property("fsm")
+    def fsm_ranking(self):
+        return fsm_ranked_from_corpus(self.corpus)
+
+    @stage_property("sube")
+    def path_ranking(self):
+        # mined once at the lowest τ; every higher τ is a slice
+        return SupportRanking.from_counts(
+            mine_paths_from_corpus(self.corpus, min(self.τ_values), max_length=self.max_length))
+
+    @cached_property
+    def fsm(self):
+        return self.fsm_ranking.sweep(self.τ_values)
+
+    @cached_property
+    def sube(self):
+        return self.path_ranking.sweep(self.τ_values)
+
+    # ========== DSM ==========
+    @stage_property("label_dsm")
+    def label_dsm(self):
+        # one support pass over every label; class pairs and one-vs-rest only slice it
+        return find_multiclass_discriminative_graphs_from_corpus(self.corpus, "label", alpha=self.alpha, beta=self.beta,
+                                                                 directed=self.directed, weighted=self.weighted)
+
+    @stage_property("class_dsm")
+    def class_dsm(self):
+        return [(name, self.label_dsm.pair(l1, l2)[0]) for name, l1, l2 in self.class_pairs]
+
+    @stage_property("phase_dsm")
+    def phase_dsm(self):
+        # phase -> (discriminative graph, graph to avoid)
+        units = [(p, self.alpha, self.beta, self.directed, self.weighted, self.approximate) for p in self.phases]
+        return dict(zip(self.phases, self.runner.map(analysis.phase_dsm, units)))
+
+    @stage_property("harmful_edges")
+    def harmful_edges(self):
+        units = [(p, self.min_support_dead, self.max_support_alive, self.directed, self.weighted, self.approximate)
+                 for p in self.phases]
+        return dict(zip(self.phases, self.runner.map(analysis.phase_harmful_edges, units)))
+
+    @stage_property("avoid_patterns")
+    def avoid_patterns(self):
+        units = [(p, self.harmful_edges[p], self.max_hops, self.directed) for p in self.phases]
+        return dict(zip(self.phases, self.runner.map(analysis.phase_avoid_patterns, units)))
+
+    def sweep(self, alphas=None, betas=None, min_support_dead=None, max_support_alive=None, τ_values=None):
+        """Threshold grid table (see sweep.sweep), defaulting every axis to this pipeline's setting."""
+        with self._stage("sweep"):
+            return sweep(self.corpus, alphas or [self.alpha], betas or [self.beta],
+                         min_support_dead or [self.min_support_dead], max_support_alive or [self.max_support_alive],
+                         τ_values or self.τ_values, self.phases, self.fsm_ranking, self.directed, self.weighted)
+
+    def cross_validate(self, k=10, seed=0, confidence=0.95):
+        """Subject-grouped k-fold evaluation with this pipeline's settings (see crossval.cross_validate)."""
+        with self._stage("cross_validate", k=k):
+            return cross_validate(self.corpus, k, self.phases, self.alpha, self.beta, self.min_support_dead,
+                                  self.max_support_alive, self.max_hops, self.directed, self.weighted, seed,
+                                  confidence, self.runner)
+
+    # ========== METRICS ==========
+    @stage_property("accuracy")
+    def accuracy(self):
+        units = [(p, self.phase_dsm[p][0], self.directed) for p in self.phases]
+        return dict(zip(self.phases, self.runner.map(analysis.phase_accuracy, units)))
+
+    @stage_property("predictions")
+    def predictions(self):
+        # phase -> (y_true, y_pred)
+        units = [(p, *self.phase_dsm[p], self.harmful_edges[p], self.avoid_patterns[p], self.directed, self.weighted)
+                 for p in self.phases]
+        return dict(zip(self.phases, self.runner.map(analysis.phase_predictions, units)))
+
+    @stage_property("metrics")
+    def metrics(self):
+        from sklearn.metrics import confusion_matrix, precision_score, recall_score
+
+        y_true = [y for p in self.phases for y in self.predictions[p][0]]
+        y_pred = [y for p in self.phases for y in self.predictions[p][1]]
+        return {
+            "confusion_matrix": confusion_matrix(y_true, y_pred),
+            "recovery_precision": precision_score(y_true, y_pred, pos_label=0),
+            "recovery_recall": recall_score(y_true, y_pred, pos_label=0),
+            "mortality_precision": precision_score(y_true, y_pred, pos_label=1),
+            "mortality_recall": recall_score(y_true, y_pred, pos_label=1),
+        }
+
+    # ========== EXPORT ==========
+    @stage_property("export")
+    def recommendations(self):
+        import pandas as pd
+
+        recommendations = []
+        for phase in self.phases:
+            disc_graph, avoid_graph = self.phase_dsm[phase]
+            # Record recommendations for recovery and avoid actions
+            for edge in disc_graph.edges():
+                recommendations.append({"phase": phase, "action_type": "do", "edge": edge})
+            for edge in avoid_graph.edges():
+                recommendations.append({"phase": phase, "action_type": "avoid", "edge": edge})
+        return pd.DataFrame(recommendations)
+
+    @stage_property("index")
+    def recommendation_index(self):
+        return RecommendationIndex.from_results(self.phase_dsm, self.avoid_patterns)
+
+    def serve(self, host="127.0.0.1", port=8000):
+        """Answer /recommend queries over HTTP from the mined patterns until interrupted."""
+        server = make_server(self.recommendation_index, host, port)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+    def export(self, path=None):
+        path = path or self._output("phasewise_recommendations.csv")
+        self.recommendations.to_csv(path, index=False)
+        return path
+
+    # ========== PLOTS ==========
+    @cached_property
+    def renderer(self):
+        return Renderer(self.render_workers)
+
+    @cached_property
+    def positions(self):
+        return PositionCache(self._output("layout_positions.json"), self.layout_threshold)
+
+    def _plot_graph(self, G, title, name, **style):
+        with self._stage("layout", figure=name):
+            instrument.count("nodes", len(G))
+            pos = self.positions.positions_for(G)
+        return self.renderer.submit(render_graph, self._output(name), title, list(G.edges()), pos,
+                                    G.is_directed(), **style)
+
+    def plot_connectivity(self):
+        return self._plot_graph(self.connectivity_graph, "Basic ICD Code Connectivity Graph", "basic_connectivity.png",
+                                node_size=20, edge_color='gray', alpha=0.5, with_labels=False)
+
+    def plot_fsm(self):
+        futures = []
+        for tau in self.τ_values:
+            fsm_result = self.fsm[tau]
+            sg = Graph(set([n for e in fsm_result for n in e]))
+            for u, v in fsm_result:
+                sg.add_edge(u, v)
+            futures.append(self._plot_graph(convert_to_nx_graph(sg), f"FSM Patterns (τ={tau})", f"fsm_tau_{tau}.png"))
+        return futures
+
+    def plot_phases(self):
+        futures = []
+        for phase in self.phases:
+            disc_graph, avoid_graph = self.phase_dsm[phase]
+            if disc_graph.number_of_edges() > 0:
+                futures.append(self._plot_graph(disc_graph, f"Recovery Actions - {phase}", f"recovery_{phase}.png"))
+            if avoid_graph.number_of_edges() > 0:
+                futures.append(self._plot_graph(avoid_graph, f"Avoid Actions - {phase}", f"avoid_{phase}.png"))
+        return futures
+
+    def plot_confusion_matrix(self):
+        return self.renderer.submit(render_heatmap, self._output("confusion_matrix.png"), "Confusion Matrix",
+                                    self.metrics["confusion_matrix"], ["Recovered", "Died"], "Predicted", "Actual")
+
+    def plots(self):
+        """Lay out and submit every figure, then wait until they are written."""
+        self.plot_connectivity()
+        self.plot_fsm()
+        self.plot_phases()
+        self.plot_confusion_matrix()
+        return self.renderer.wait()
+
+    # ========== FULL RUN ==========
+    def run(self):
+        """Run every stage in order with the report printed by main.py."""
+        print("Corpus:", self.corpus)
+        # figures are submitted as soon as their stage is mined and render while mining goes on
+        self.plot_connectivity()
+        for tau in self.τ_values:
+            print(f"\nRunning FSM with τ={tau}")
+            print(f"Frequent edges: {len(self.fsm[tau])}, frequent paths: {len(self.sube[tau])}")
+        self.plot_fsm()
+
+        counts = {name: len(groups) for name, groups in self.label_groups.items()}
+        print(f"# Urgent: {counts['Urgent']}, Chronic: {counts['Chronic']}, Non-Urgent: {counts['Non-Urgent']}")
+        for name1, dg in self.class_dsm:
+            print(f"\nDiscriminative edges for {name1} vs other:", list(dg.edges()))
+
+        for phase in self.phases:
+            alive, dead = self.phase_groups[phase]
+            print(f"\n--- Phase {phase} ---")
+            print(f"# Alive: {len(alive)}, Dead: {len(dead)}")
+            print(f"Accuracy: {self.accuracy[phase]:.2%}")
+            print("Harmful Edges Found:", len(self.harmful_edges[phase]))
+            if self.avoid_patterns[phase]:
+                print(f"Avoid actions for phase: {phase}")
+                for pattern in self.avoid_patterns[phase]:
+                    print(pattern)
+            else:
+                print(f"No avoid actions for phase: {phase}")
+        self.plot_phases()
+
+        print("\n== Predictive Performance Summary ==")
+        metrics = self.metrics
+        print("Confusion Matrix:\n", metrics["confusion_matrix"])
+        print(f"Recovery Precision: {metrics['recovery_precision']:.2f}, Recall: {metrics['recovery_recall']:.2f}")
+        print(f"Mortality Precision: {metrics['mortality_precision']:.2f}, Recall: {metrics['mortality_recall']:.2f}")
+
+        self.plot_confusion_matrix()
+        self.export()
+        self.renderer.wait()
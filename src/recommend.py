@@ -0,0 +1,281 @@
+import ast
+import json
+import threading
+from collections import OrderedDict, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# action_type: "do" or "avoid"; pattern: tuple of ICD codes (2 codes for an edge)
+Action = namedtuple("Action", ["action_type", "pattern"])
+
+
+class PatternAutomaton:
+    """
+    Aho-Corasick automaton over the action patterns of one phase.
+
+    State 0 is the root; the children of the root are the source ICD codes of
+    the patterns, so `goto[0][code]` indexes every pattern starting at `code`.
+    Every state is a prefix shared by one or more patterns; `fail` points to the
+    state of its longest proper suffix that is also a prefix, `output` lists the
+    patterns ending there (including those ending on its fail chain) and
+    `continuations` the (action, next code) pairs that would extend it.
+    """
+
+    def __init__(self, actions):
+        self.actions = list(dict.fromkeys(actions))
+        self.goto = [{}]
+        self.output = [[]]
+        self.continuations = [[]]
+        for a, action in enumerate(self.actions):
+            state = 0
+            for code in action.pattern:
+                if state:
+                    self.continuations[state].append((a, code))
+                if code not in self.goto[state]:
+                    self.goto[state][code] = len(self.goto)
+                    self.goto.append({})
+                    self.output.append([])
+                    self.continuations.append([])
+                state = self.goto[state][code]
+            self.output[state].append(a)
+
+        # breadth first, so a state's fail target is finished before the state itself
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for code, child in self.goto[state].items():
+                queue.append(child)
+                f = self.fail[state]
+                while f and code not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(code, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def __len__(self):
+        return len(self.goto)
+
+    def step(self, state, code):
+        while state and code not in self.goto[state]:
+            state = self.fail[state]
+        return self.goto[state].get(code, 0)
+
+    def starting_at(self, code):
+        """Actions whose pattern starts at ICD code `code`, with the code following it."""
+        state = self.goto[0].get(code)
+        if state is None:
+            return []
+        return [(self.actions[a], nxt) for a, nxt in self.continuations[state]]
+
+    def next_actions(self, state):
+        """(action, next code) for every pattern partially matched by a suffix ending in `state`."""
+        found = []
+        while state:
+            found += [(self.actions[a], code) for a, code in self.continuations[state]]
+            state = self.fail[state]
+        return found
+
+
+class RecommendationIndex:
+    """
+    Answers "which do/avoid actions apply to this patient now?" from the mined
+    phase-wise patterns: do edges of the discriminative graph, avoid edges of the
+    graph to avoid and the avoid paths of extract_action_patterns().
+
+    A query walks the patient's ICD sequence through the phase's PatternAutomaton.
+    The states reached by recent sequences are kept in an LRU cache, so a live
+    sequence growing one code at a time costs one automaton step per query.
+    DSM edges are undirected and are indexed in both orientations.
+
+    Parameters:
+        actions: dict phase -> iterable of Action
+        cache_size: int — number of sequence prefix states kept
+    """
+
+    def __init__(self, actions, cache_size=10000):
+        self.automata = {phase: PatternAutomaton(a) for phase, a in actions.items()}
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        patterns = sum(len(a.actions) for a in self.automata.values())
+        return f"RecommendationIndex(phases={list(self.automata)}, patterns={patterns})"
+
+    @property
+    def phases(self):
+        return list(self.automata)
+
+    @classmethod
+    def from_results(cls, phase_dsm, avoid_patterns=None, cache_size=10000):
+        """Index the Pipeline's phase_dsm (phase -> (disc_graph, avoid_graph)) and avoid_patterns."""
+        actions = {}
+        for phase, (disc_graph, avoid_graph) in phase_dsm.items():
+            actions[phase] = _edge_actions("do", disc_graph.edges()) + _edge_actions("avoid", avoid_graph.edges())
+            for path in (avoid_patterns or {}).get(phase, ()):
+                actions[phase].append(Action("avoid", tuple(str(c) for c in path)))
+        return cls(actions, cache_size)
+
+    @classmethod
+    def from_csv(cls, path="phasewise_recommendations.csv", cache_size=10000):
+        """Index a recommendations table written by Pipeline.export()."""
+        import pandas as pd
+
+        actions = {}
+        for row in pd.read_csv(path, dtype=str).itertuples(index=False):
+            actions.setdefault(row.phase, []).extend(_edge_actions(row.action_type, [ast.literal_eval(row.edge)]))
+        return cls(actions, cache_size)
+
+    def _walk(self, phase, sequence):
+        # (state, ids of the matched actions) after `sequence`, resuming from the longest cached prefix
+        automaton = self.automata[phase]
+        key = (phase, sequence)
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            start, cached = 0, (0, frozenset())
+            for end in range(len(sequence) - 1, 0, -1):
+                prefix = self.cache.get((phase, sequence[:end]))
+                if prefix is not None:
+                    start, cached = end, prefix
+                    break
+            self.misses += 1
+
+        state, matched = cached
+        new = set()
+        for code in sequence[start:]:
+            state = automaton.step(state, code)
+            new.update(automaton.output[state])
+        result = (state, matched | new if new else matched)
+
+        with self.lock:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def query(self, phase, sequence):
+        """
+        Actions for a patient in `phase` whose ICD codes so far are `sequence`.
+
+        Returns:
+            dict with "matched": actions whose whole pattern already occurs in the
+            sequence, and "next": actions the next code would continue, as dicts
+            with the action type, the pattern and the code to do or avoid next
+        """
+        if phase not in self.automata:
+            raise KeyError(f"no patterns mined for phase {phase!r}")
+        automaton = self.automata[phase]
+        sequence = tuple(str(c) for c in sequence)
+        state, matched = self._walk(phase, sequence)
+        return {
+            "phase": phase,
+            "matched": [_as_dict(automaton.actions[a]) for a in sorted(matched)],
+            "next": [dict(_as_dict(action), code=code) for action, code in automaton.next_actions(state)],
+        }
+
+    def from_code(self, phase, code):
+        """Actions whose pattern starts at ICD code `code`."""
+        return [dict(_as_dict(action), code=nxt) for action, nxt in self.automata[phase].starting_at(str(code))]
+
+    def session(self, phase):
+        return Session(self, phase)
+
+
+class Session:
+    """Incremental matcher for one live patient: feed() codes as they are recorded."""
+
+    def __init__(self, index, phase):
+        self.index = index
+        self.automaton = index.automata[phase]
+        self.state = 0
+        self.matched = set()
+
+    def feed(self, code):
+        """Advance by one ICD code; returns the actions whose pattern this code completed."""
+        self.state = self.automaton.step(self.state, str(code))
+        done = [a for a in self.automaton.output[self.state] if a not in self.matched]
+        self.matched.update(done)
+        return [_as_dict(self.automaton.actions[a]) for a in done]
+
+    def next_actions(self):
+        return [dict(_as_dict(action), code=code) for action, code in self.automaton.next_actions(self.state)]
+
+
+def _edge_actions(action_type, edges):
+    # DSM graphs are undirected, so an edge is recommended in both orientations
+    actions = []
+    for u, v in edges:
+        actions.append(Action(action_type, (str(u), str(v))))
+        actions.append(Action(action_type, (str(v), str(u))))
+    return actions
+
+
+def _as_dict(action):
+    return {"action_type": action.action_type, "pattern": list(action.pattern)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # GET /recommend?phase=early&codes=A,B,C  or  POST /recommend {"phase": ..., "codes": [...]}
+    index = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        codes = params.get("codes", [""])[0]
+        self._answer(url.path, params.get("phase", [None])[0], [c for c in codes.split(",") if c])
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except (json.JSONDecodeError, ValueError, TypeError):
+            return self.send_error(400, "body must be a JSON object")
+        if not isinstance(body, dict):
+            return self.send_error(400, "body must be a JSON object")
+        codes = body.get("codes", [])
+        if not isinstance(codes, list) or not all(isinstance(c, str) for c in codes):
+            return self.send_error(400, "codes must be a list of ICD code strings")
+        self._answer(urlparse(self.path).path, body.get("phase"), codes)
+
+    def _answer(self, path, phase, codes):
+        if path != "/recommend":
+            return self._send(404, {"error": f"unknown path {path}"})
+        if not isinstance(phase, str) or phase not in self.index.automata:
+            return self._send(400, {"error": f"phase must be one of {self.index.phases}"})
+        self._send(200, self.index.query(phase, codes))
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(index, host="127.0.0.1", port=8000):
+    """Threaded HTTP server answering /recommend from `index` (port 0 picks a free port)."""
+    handler = type("RecommendHandler", (_Handler,), {"index": index})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve phase-wise recommendations over HTTP")
+    parser.add_argument("--recommendations", default="phasewise_recommendations.csv", help="table written by the pipeline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    index = RecommendationIndex.from_csv(args.recommendations)
+    server = make_server(index, args.host, args.port)
+    print(f"{index} listening on http://{args.host}:{server.server_address[1]}/recommend")
+    server.serve_forever()
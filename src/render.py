@@ -0,0 +1,132 @@
+import json
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import networkx as nx
+
+# above this many nodes Kamada-Kawai (O(n²) memory, ~O(n³) time) is replaced by a sparse spring layout
+LAYOUT_THRESHOLD = 500
+
+# every figure of a run shares the size of the connectivity figure
+FIGSIZE = (10, 6)
+
+
+def layout(G, fixed=None, threshold=LAYOUT_THRESHOLD, seed=0):
+    """
+    Node positions for G. Nodes found in `fixed` keep those positions and only
+    the others are laid out around them; a graph with no known node gets
+    Kamada-Kawai up to `threshold` nodes and a sparse spring layout above.
+    """
+    known = {n: fixed[n] for n in G if fixed and n in fixed}
+    if len(known) == len(G):
+        return known
+    if not known:
+        if len(G) <= threshold:
+            return nx.kamada_kawai_layout(G)
+        # networkx switches to its sparse Fruchterman-Reingold solver for large graphs
+        return nx.spring_layout(G, iterations=50, seed=seed)
+    return nx.spring_layout(G, pos=known, fixed=list(known), iterations=50, seed=seed)
+
+
+class PositionCache:
+    """
+    Node positions per ICD code shared by every figure of a run, so the FSM,
+    recovery and avoid graphs draw each code where the connectivity graph put
+    it. With a path the positions are kept on disk and reused by later runs.
+    """
+
+    def __init__(self, path=None, threshold=LAYOUT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.positions = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.positions = {code: tuple(xy) for code, xy in json.load(f).items()}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def positions_for(self, G):
+        pos = layout(G, self.positions, self.threshold)
+        for node, xy in pos.items():
+            self.positions.setdefault(node, (float(xy[0]), float(xy[1])))
+        return {node: self.positions[node] for node in G}
+
+    def save(self):
+        if self.path is not None:
+            with open(self.path, "w") as f:
+                json.dump(self.positions, f)
+
+
+def render_graph(path, title, edges, pos, directed=False, figsize=FIGSIZE, **style):
+    """Draw a graph with precomputed positions and save it to `path`."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    G = nx.DiGraph() if directed else nx.Graph()
+    G.add_nodes_from(pos)
+    G.add_edges_from(edges)
+    fig = plt.figure(figsize=figsize)
+    nx.draw_networkx(G, pos=pos, **style)
+    plt.title(title)
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def render_heatmap(path, title, matrix, labels, xlabel, ylabel):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig = plt.figure(figsize=FIGSIZE)
+    sns.heatmap(matrix, annot=True, fmt='d', cmap='Blues', xticklabels=labels, yticklabels=labels)
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+class Renderer:
+    """
+    Runs figure rendering on a background process pool so the caller can keep
+    mining; workers=0 renders inline. close() waits for every pending figure.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.pool = None
+        self.pending = []
+
+    def submit(self, fn, *args, **kwargs):
+        if self.workers <= 0:
+            future = Future()
+            future.set_result(fn(*args, **kwargs))
+            return future
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        future = self.pool.submit(fn, *args, **kwargs)
+        self.pending.append(future)
+        return future
+
+    def wait(self):
+        """Block until every submitted figure is written; returns their paths."""
+        paths = [future.result() for future in self.pending]
+        self.pending = []
+        return paths
+
+    def close(self):
+        if self.pool is not None:
+            self.wait()
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
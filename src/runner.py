@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from corpus import Corpus
+import instrument
+
+# arrays of a Corpus that are placed in shared memory; codes/phases are small and pickled
+ARRAYS = ("src", "dst", "offsets", "subject_id", "hadm_id", "phase", "mortality", "label")
+
+# corpus attached by a pool worker's initializer
+_worker_corpus = None
+
+
+class SharedCorpus:
+    """
+    A Corpus whose arrays live in shared memory blocks so pool workers map them
+    zero-copy instead of receiving a pickled copy per task. Use as a context
+    manager in the parent; the blocks are released on exit.
+    """
+
+    def __init__(self, corpus):
+        self.blocks = {}
+        self.layout = {}
+        for name in ARRAYS:
+            array = getattr(corpus, name)
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks[name] = block
+            self.layout[name] = (block.name, array.shape, array.dtype.str)
+        self.codes = list(corpus.codes)
+        self.phases = corpus.phases
+
+    def handle(self):
+        # picklable description that attach() turns back into a Corpus
+        return self.layout, self.codes, self.phases
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(handle):
+    layout, codes, phases = handle
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    corpus = Corpus(codes=codes, phases=phases, **arrays)
+    # keep the mappings alive as long as the corpus
+    corpus._shared_blocks = blocks
+    return corpus
+
+
+def _init_worker(handle):
+    global _worker_corpus
+    _worker_corpus = attach(handle)
+
+
+def _call(task):
+    # stage records produced in the worker are sent back with the result
+    fn, unit, config = task
+    if config is None:
+        return fn(_worker_corpus, unit), []
+    with instrument.capture(config) as records:
+        result = fn(_worker_corpus, unit)
+    return result, records
+
+
+class Runner:
+    """
+    Maps fn(corpus, unit) over units, on a process pool when workers > 1. The
+    shared corpus and the pool are created on first parallel use and reused by
+    later calls until close().
+    """
+
+    def __init__(self, corpus, workers=1):
+        self.corpus = corpus
+        self.workers = workers
+        self.shared = None
+        self.pool = None
+
+    def map(self, fn, units):
+        # results are returned in the order of `units` whatever order they finish in
+        units = list(units)
+        if self.workers <= 1 or len(units) <= 1:
+            return [fn(self.corpus, unit) for unit in units]
+        if self.pool is None:
+            self.shared = SharedCorpus(self.corpus)
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.shared.handle(),))
+        current = instrument.active()
+        config = current.config() if current is not None else None
+        results = []
+        for result, records in self.pool.map(_call, [(fn, unit, config) for unit in units]):
+            instrument.forward(records)
+            results.append(result)
+        return results
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.shared.close()
+            self.pool = self.shared = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_units(fn, units, corpus, workers=1):
+    """Run fn(corpus, unit) for every unit, on a process pool when workers > 1."""
+    units = list(units)
+    with Runner(corpus, min(workers, len(units))) as runner:
+        return runner.map(fn, units)
@@ -1,47 +1,170 @@
+import numpy as np
+
+from corpus import edge_keys
+from support import pack_graphs
+import instrument
+
+
+class PathIndex:
+    """
+    Inverted index over patient transition sequences for path-pattern mining.
+
+    Transitions of one graph are stored at consecutive positions, so a path
+    A->B->C occurs wherever the transition at position p is A->B and the one at
+    p + 1 (same graph) is B->C. Patterns are grown PrefixSpan-style by joining
+    the occurrence list of a pattern with the transition that follows each
+    occurrence, never by rescanning the graphs.
+
+    Attributes:
+        keys: np.ndarray[int64] — edge key of every transition
+        dst: np.ndarray[int64] — target code id of every transition
+        owner: np.ndarray[int64] — graph id of every transition
+        codes: np.ndarray — node labels indexed by code id
+        edge_keys: np.ndarray[int64] — sorted distinct edge keys
+        edge_offsets: np.ndarray[int64] — CSR bounds of every edge in `positions`
+        positions: np.ndarray[int64] — transition positions grouped by edge
+    """
+
+    def __init__(self, src, dst, owner, codes):
+        self.codes = codes
+        self.dst = np.asarray(dst, dtype=np.int64)
+        self.owner = np.asarray(owner, dtype=np.int64)
+        self.keys = edge_keys(src, dst, len(codes))
+
+        # edge -> occurrence positions, sorted by position within each edge
+        self.positions = np.argsort(self.keys, kind="stable")
+        self.edge_keys, starts = np.unique(self.keys[self.positions], return_index=True)
+        self.edge_offsets = np.append(starts, len(self.keys))
+
+    @classmethod
+    def from_edge_lists(cls, G):
+        src, dst, lengths, codes = pack_graphs(G, node_key=str)
+        return cls(src, dst, np.repeat(np.arange(len(lengths)), lengths), codes)
+
+    @classmethod
+    def from_corpus(cls, corpus, groups=None):
+        pos, owner = corpus.transition_index(groups)
+        return cls(corpus.src[pos], corpus.dst[pos], owner, corpus.codes)
+
+    @property
+    def n_codes(self):
+        return len(self.codes)
+
+    def encode(self, edges):
+        """Encode (code, code) pairs to edge keys; pairs with unknown codes become -1."""
+        index = {c: i for i, c in enumerate(self.codes)}
+        keys = []
+        for u, v in edges:
+            i, j = index.get(str(u)), index.get(str(v))
+            keys.append(-1 if i is None or j is None else i * self.n_codes + j)
+        return np.asarray(keys, dtype=np.int64)
+
+    def occurrences(self, key):
+        """Positions of every transition equal to edge `key`."""
+        i = np.searchsorted(self.edge_keys, key)
+        if i == len(self.edge_keys) or self.edge_keys[i] != key:
+            return np.zeros(0, dtype=np.int64)
+        return self.positions[self.edge_offsets[i]:self.edge_offsets[i + 1]]
+
+    def graphs_with(self, key):
+        """Ids of the graphs containing edge `key`."""
+        return np.unique(self.owner[self.occurrences(key)])
+
+    def edge_support(self):
+        # graph-level support of every distinct edge, aligned with edge_keys
+        if len(self.keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        keys, graphs = self.keys[self.positions], self.owner[self.positions]
+        first = np.ones(len(keys), dtype=np.int64)
+        first[1:] = (keys[1:] != keys[:-1]) | (graphs[1:] != graphs[:-1])
+        return np.add.reduceat(first, self.edge_offsets[:-1])
+
+    def _support(self, pattern_ids, ends, n_patterns):
+        # graph-level support: each (pattern, graph) pair counts once
+        pairs = np.unique(np.stack([pattern_ids, self.owner[ends]]), axis=1)
+        return np.bincount(pairs[0], minlength=n_patterns)
+
+    def mine(self, τ, max_length=3, seeds=None, extend_with=None):
+        """
+        Mine every path pattern occurring in at least τ graphs.
+
+        Parameters:
+            τ: int — minimum number of graphs containing the path
+            max_length: int — longest path to mine, in codes (A->B->C is 3)
+            seeds: iterable of edges — only grow these edges (default: every frequent edge)
+            extend_with: iterable of edges — edges allowed as extensions
+                         (default: every edge occurring in at least τ graphs)
+
+        Returns:
+            dict mapping each path (tuple of codes) to its graph-level support
+        """
+        n = self.n_codes
+        edge_support = self.edge_support()
+        frequent = self.edge_keys[edge_support >= τ]
+        allowed = frequent if extend_with is None else self.encode(extend_with)
+        extendable = np.isin(self.keys, allowed)
+
+        if seeds is None:
+            seed_keys = frequent
+        else:
+            seed_keys = np.unique(self.encode(seeds))
+            seed_keys = seed_keys[np.isin(seed_keys, self.edge_keys)]
+
+        results = {}
+        seed_support = edge_support[np.searchsorted(self.edge_keys, seed_keys)] if len(seed_keys) else []
+        for key, count in zip(seed_keys, seed_support):
+            if count >= τ:
+                results[(self.codes[key // n], self.codes[key % n])] = int(count)
+
+        # occurrence list of every seed: (pattern id, position of its last transition)
+        ends = np.concatenate([self.occurrences(k) for k in seed_keys]) if len(seed_keys) else np.zeros(0, dtype=np.int64)
+        pattern_ids = np.searchsorted(seed_keys, self.keys[ends])
+        patterns = np.stack([seed_keys // n, seed_keys % n], axis=1)
+
+        for _ in range(3, max_length + 1):
+            nxt = ends + 1
+            ok = nxt < len(self.keys)
+            # the next transition must start where the pattern ends (edge lists need not be chains)
+            ok[ok] = ((self.owner[nxt[ok]] == self.owner[ends[ok]]) & (self.keys[nxt[ok]] // n == self.dst[ends[ok]])
+                      & extendable[nxt[ok]])
+            ends, pattern_ids = nxt[ok], pattern_ids[ok]
+            if len(ends) == 0:
+                break
+
+            # join: pattern P followed by code c becomes candidate P + (c,)
+            candidates, inverse = np.unique(pattern_ids * n + self.dst[ends], return_inverse=True)
+            support = self._support(inverse, ends, len(candidates))
+            keep = support >= τ
+            instrument.count("path_candidates", len(candidates))
+            instrument.count("frequent_paths", keep.sum())
+            if not keep.any():
+                break
+
+            patterns = np.hstack([patterns[candidates[keep] // n], (candidates[keep] % n)[:, None]])
+            new_ids = np.cumsum(keep) - 1
+            survives = keep[inverse]
+            ends, pattern_ids = ends[survives], new_ids[inverse[survives]]
+            for path, count in zip(patterns, support[keep]):
+                results[tuple(self.codes[path])] = int(count)
+
+        return results
+
+
+def mine_paths(G, τ, max_length=3):
+    """Frequent path patterns over a list of edge lists (the fsm()/subE() input format)."""
+    return PathIndex.from_edge_lists(G).mine(τ, max_length)
+
+
+def mine_paths_from_corpus(corpus, τ, max_length=3, groups=None):
+    return PathIndex.from_corpus(corpus, groups).mine(τ, max_length)
+
+
 def subE(edge, G, τ, fEdges):
-    candidates = set()
-    subnew = set()
-
-    # Debugging: Print the edge being processed
-    # print(f"Processing edge: {edge}")
-
-    for graph in G:
-        if edge not in graph:
-            continue
-        
-        # Debugging: Print current graph being processed
-        # print(f"Processing graph: {graph}")
-
-        # Try to extend the edge in the graph
-        for e in graph:
-            if e == edge:
-                continue
-            
-            # Debugging: Check if we can extend the edge
-            # print(f"Checking if {str(edge[1])} == {str(e[0])}")
-
-            # Naive extension: if nodes connect, try to build larger subgraph
-            if str(edge[1]) == str(e[0]):  # Ensure both are strings
-                new_sub = (str(edge[0]), str(edge[1]), str(e[1]))  # A-B-C from A-B and B-C
-                candidates.add(new_sub)
-                # print(f"Candidate found: {new_sub}")
-
-    # Filter based on frequency
-    for cand in candidates:
-        count = 0
-        for graph in G:
-            # Reduce to sequences for easy matching
-            if len(graph) > 1:
-                seq = [u for u, _ in graph] + [graph[-1][1]]
-            else:
-                seq = [u for u, _ in graph]  # Handle single edge case
-
-            str_cand = ''.join(cand)
-            if str_cand in ''.join(seq):
-                count += 1
-        if count >= τ:
-            subnew.add(cand)
-
-    # Debugging: Print the resulting subgraphs
-    # print(f"Subgraphs: {subnew}")
-    return subnew
\ No newline at end of file
+    # extend A->B by every B->C that directly follows it in at least τ graphs
+    paths = PathIndex.from_edge_lists(G).mine(τ, 3, seeds=[edge], extend_with=fEdges)
+    return {p for p in paths if len(p) == 3}
+
+
+def subE_from_corpus(edge, corpus, τ, fEdges=None, groups=None):
+    paths = PathIndex.from_corpus(corpus, groups).mine(τ, 3, seeds=[edge], extend_with=fEdges)
+    return {p for p in paths if len(p) == 3}
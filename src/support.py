@@ -0,0 +1,225 @@
+import numpy as np
+
+from corpus import edge_keys
+from graph import PatientGraph
+
+
+class EdgeSupport:
+    """
+    Per-class edge support table produced by one counting pass.
+
+    Graph-level counting also sums the repeat weight of every edge in the same
+    pass, so `weights` holds the weighted support (transition occurrences, or
+    the graphs' `weight` attribute) next to `counts`; weighted() swaps them.
+
+    Attributes:
+        keys: np.ndarray[int64] — sorted edge keys (src * n_codes + dst); with
+              directed=False, u -> v and v -> u share the key of (min, max)
+        counts: np.ndarray[int64] — class x edge support matrix
+        totals: np.ndarray[int64] — number of graphs in every class
+        codes: np.ndarray — node labels indexed by code id
+        weights: np.ndarray[int64] — class x edge weighted support (None if not counted)
+        directed: bool — whether edge orientation was kept
+    """
+
+    def __init__(self, keys, counts, totals, codes, weights=None, directed=True):
+        self.keys = keys
+        self.counts = counts
+        self.totals = totals
+        self.codes = codes
+        self.weights = weights
+        self.directed = directed
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return f"EdgeSupport(classes={len(self.totals)}, edges={len(self.keys)})"
+
+    @property
+    def n_codes(self):
+        return len(self.codes)
+
+    def weighted(self):
+        """The same table with the weighted support as `counts`."""
+        if self.weights is None:
+            raise ValueError("weighted support is only counted with distinct=True")
+        return EdgeSupport(self.keys, self.weights, self.totals, self.codes, self.weights, self.directed)
+
+    def frequency(self):
+        # support as a fraction of the graphs in each class
+        return self.counts / np.maximum(self.totals, 1)[:, None]
+
+    def lookup(self, query):
+        """Class x query support for arbitrary edge keys, 0 for edges never seen."""
+        query = np.asarray(query, dtype=np.int64)
+        if not self.directed:
+            query = undirected_keys(query, self.n_codes)
+        if len(self.keys) == 0:
+            return np.zeros((len(self.totals), len(query)), dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.keys, query), len(self.keys) - 1)
+        return np.where(self.keys[idx] == query, self.counts[:, idx], 0)
+
+    def edges(self, mask=None):
+        keys = self.keys if mask is None else self.keys[mask]
+        return list(zip(self.codes[keys // self.n_codes], self.codes[keys % self.n_codes]))
+
+
+def undirected_keys(keys, n_codes):
+    # u -> v and v -> u both become the key of (min(u, v), max(u, v))
+    keys = np.asarray(keys, dtype=np.int64)
+    src, dst = keys // n_codes, keys % n_codes
+    return np.minimum(src, dst) * n_codes + np.maximum(src, dst)
+
+
+def count_support(keys, owner, owner_class, n_classes, distinct=True, weights=None):
+    """
+    Count per-class edge support in one pass.
+
+    Parameters:
+        keys: np.ndarray[int64] — edge key of every transition
+        owner: np.ndarray[int64] — graph slot every transition belongs to
+        owner_class: np.ndarray[int64] — class of every graph slot (-1 to skip it)
+        n_classes: int — number of classes
+        distinct: bool — count an edge once per graph (graph-level support)
+                         instead of once per transition
+        weights: np.ndarray — repeat weight of every transition (1 if None)
+
+    Returns:
+        (unique edge keys, class x edge count matrix); with distinct=True also
+        the class x edge sum of the weights, from the same sort
+    """
+    cls = owner_class[owner]
+    keep = cls >= 0
+    keys, owner, cls = keys[keep], owner[keep], cls[keep]
+    weights = np.ones(len(keys), dtype=np.int64) if weights is None else np.asarray(weights)[keep]
+
+    if not distinct:
+        unique, inverse = np.unique(keys, return_inverse=True)
+        flat = np.bincount(cls * len(unique) + inverse, weights=weights, minlength=n_classes * len(unique))
+        return unique, flat.astype(np.int64).reshape(n_classes, len(unique))
+
+    order = np.lexsort((keys, owner))
+    keys, owner, cls, weights = keys[order], owner[order], cls[order], weights[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (owner[1:] != owner[:-1]) | (keys[1:] != keys[:-1])
+    # repeat weight of every (graph, edge) run
+    run_weight = np.add.reduceat(weights, np.flatnonzero(first)) if len(keys) else weights
+    keys, cls = keys[first], cls[first]
+
+    unique, inverse = np.unique(keys, return_inverse=True)
+    slot = cls * len(unique) + inverse
+    flat = np.bincount(slot, minlength=n_classes * len(unique))
+    weighted = np.bincount(slot, weights=run_weight, minlength=n_classes * len(unique)).astype(np.int64)
+    return unique, flat.reshape(n_classes, len(unique)), weighted.reshape(n_classes, len(unique))
+
+
+def _slots(lengths, classes):
+    # slot id per transition and class id per slot for a concatenation of graph groups
+    slot_class = np.repeat(np.arange(len(classes)), [len(c) for c in classes])
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    return owner, slot_class
+
+
+def _edge_support(keys, owner, slot_class, classes, codes, distinct, directed, weights=None):
+    if not directed:
+        keys = undirected_keys(keys, len(codes))
+    counted = count_support(keys, owner, slot_class, len(classes), distinct, weights)
+    totals = np.array([len(c) for c in classes], dtype=np.int64)
+    return EdgeSupport(*counted[:2], totals, codes, counted[2] if distinct else None, directed)
+
+
+def corpus_support(corpus, *classes, distinct=True, directed=True):
+    """
+    Edge support of every class of corpus groups in one pass. A group may
+    belong to several classes; it is counted in each of them. The weighted
+    support counts every occurrence of a transition.
+    """
+    classes = [corpus.group_ids(c) for c in classes]
+    groups = np.concatenate(classes) if classes else np.zeros(0, dtype=np.int64)
+    pos, _ = corpus.transition_index(groups)
+    lengths = corpus.offsets[groups + 1] - corpus.offsets[groups]
+    owner, slot_class = _slots(lengths, classes)
+    return _edge_support(corpus.keys[pos], owner, slot_class, classes, corpus.codes, distinct, directed)
+
+
+def pack_graphs(graphs, node_key=None, weight=None):
+    """
+    Intern the nodes of a list of graphs (nx graphs or lists of edge tuples)
+    and pack their edges into src/dst code id arrays.
+
+    Parameters:
+        weight: str — also return every edge's value of this attribute (1 where
+                missing, and for edge lists), e.g. "weight" for the repeat counts
+                of patientGraphs.build_patient_graphs
+
+    Returns:
+        (src, dst, lengths, codes), or (src, dst, weights, lengths, codes) with a weight
+    """
+    if node_key is None and graphs and all(isinstance(g, PatientGraph) for g in graphs) \
+            and all(g.codes is graphs[0].codes for g in graphs):
+        # compact graphs over one code table are already encoded
+        codes = graphs[0].codes
+        keys = np.concatenate([g.keys for g in graphs])
+        lengths = np.array([g.number_of_edges() for g in graphs], dtype=np.int64)
+        if weight is None:
+            return keys // len(codes), keys % len(codes), lengths, codes
+        weights = np.concatenate([g.weight for g in graphs]).astype(np.int64)
+        return keys // len(codes), keys % len(codes), weights, lengths, codes
+
+    index = {}
+    src, dst, weights, lengths = [], [], [], []
+    for g in graphs:
+        if weight is not None and hasattr(g, "edges"):
+            edges = g.edges(data=weight, default=1)
+        else:
+            edges = g.edges() if hasattr(g, "edges") else g
+        n = 0
+        for edge in edges:
+            u, v = edge[0], edge[1]
+            if node_key is not None:
+                u, v = node_key(u), node_key(v)
+            src.append(index.setdefault(u, len(index)))
+            dst.append(index.setdefault(v, len(index)))
+            if weight is not None:
+                weights.append(edge[2] if len(edge) > 2 else 1)
+            n += 1
+        lengths.append(n)
+    codes = np.empty(len(index), dtype=object)
+    for node, i in index.items():
+        codes[i] = node
+    packed = (np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64))
+    if weight is not None:
+        packed += (np.asarray(weights, dtype=np.int64),)
+    return packed + (np.asarray(lengths, dtype=np.int64), codes)
+
+
+def graph_support(*classes, distinct=True, node_key=None, directed=True, weight=None):
+    """
+    Edge support of every class of graphs (lists of graphs) in one pass. With
+    a weight attribute name, the weighted support sums it instead of counting
+    edge occurrences.
+
+    Undirected graphs (is_directed() False) have no edge orientation: their
+    u - v edges are always counted as one edge, and when every graph is
+    undirected the whole support is undirected.
+    """
+    graphs = [g for c in classes for g in c]
+    if weight is None:
+        src, dst, lengths, codes = pack_graphs(graphs, node_key)
+        weights = None
+    else:
+        src, dst, weights, lengths, codes = pack_graphs(graphs, node_key, weight)
+    owner, slot_class = _slots(lengths, classes)
+    keys = edge_keys(src, dst, len(codes))
+    undirected = np.array([not is_directed(g) for g in graphs], dtype=bool)
+    if graphs and undirected.all():
+        directed = False
+    elif directed and undirected.any():
+        keys = np.where(undirected[owner], undirected_keys(keys, len(codes)), keys)
+    return _edge_support(keys, owner, slot_class, classes, codes, distinct, directed, weights)
+
+
+def is_directed(graph):
+    # edge lists keep the orientation of their tuples
+    return graph.is_directed() if hasattr(graph, "is_directed") else True
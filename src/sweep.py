@@ -0,0 +1,133 @@
+import itertools
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from accuracy import _score
+from containment import ContainmentIndex
+from discgraph import _empty
+from corpus import PHASES
+from fsm import fsm_ranked_from_corpus
+from support import corpus_support
+import instrument
+
+COLUMNS = ["phase", "alpha", "beta", "min_support_dead", "max_support_alive", "tau",
+           "discriminative_edges", "avoid_edges", "harmful_edges", "frequent_edges", "accuracy"]
+
+
+class PhaseSweep:
+    """
+    Every α/β and min_support_dead/max_support_alive setting of one phase,
+    answered from a single alive/dead support count.
+
+    find_discriminative_graph() and find_harmful_edges() only threshold the
+    class supports, so a grid of thresholds is a broadcast comparison of the
+    support vectors against the grid values. The accuracy of a discriminative
+    graph is computed once per distinct edge set, on one ContainmentIndex.
+
+    Parameters:
+        corpus: Corpus — integer-encoded transition corpus
+        alive_groups, dead_groups: group ids of the phase's alive and dead graphs
+        directed, weighted: edge semantics, as in find_discriminative_graph
+    """
+
+    def __init__(self, corpus, alive_groups, dead_groups, directed=None, weighted=False):
+        self.corpus = corpus
+        self.alive_groups = corpus.group_ids(alive_groups)
+        self.dead_groups = corpus.group_ids(dead_groups)
+        self.directed = directed
+        # rows: 0 = alive (class 1 of the DSM), 1 = dead
+        support = corpus_support(corpus, self.alive_groups, self.dead_groups, directed=directed is not False)
+        self.support = support.weighted() if weighted else support
+        self._index = None
+        self._accuracy = {}
+        # edge x graph-edge indicator: with directed=None the DSM returns undirected
+        # nx graphs, where u -> v and v -> u are one edge
+        n = self.support.n_codes
+        src, dst = self.support.keys // n, self.support.keys % n
+        if directed is None:
+            src, dst = np.minimum(src, dst), np.maximum(src, dst)
+        _, pair = np.unique(src * n + dst, return_inverse=True)
+        self._pairs = csr_matrix((np.ones(len(pair)), (np.arange(len(pair)), pair)),
+                                 shape=(len(pair), pair.max(initial=-1) + 1))
+
+    def number_of_edges(self, masks):
+        """Edges of the undirected graph built from every edge mask (last axis)."""
+        masks = np.asarray(masks)
+        flat = masks.reshape(-1, masks.shape[-1]).astype(np.float64)
+        return (np.asarray(flat @ self._pairs) > 0).sum(axis=1).reshape(masks.shape[:-1])
+
+    def discriminative(self, alphas, betas):
+        """α x β x edge masks of the discriminative edges and β x edge masks of the edges to avoid."""
+        counts1, counts2 = self.support.counts
+        freq1, freq2 = self.support.frequency()
+        frequent = (counts1 > 0) & (freq1 >= np.asarray(alphas, dtype=float)[:, None])
+        rare = freq2 <= np.asarray(betas, dtype=float)[:, None]
+        avoid = (counts2 > 0) & (freq2 >= np.asarray(betas, dtype=float)[:, None])
+        return frequent[:, None, :] & rare[None, :, :], avoid
+
+    def harmful(self, min_support_dead, max_support_alive):
+        """min_support_dead x max_support_alive x edge masks of the harmful edges."""
+        alive, dead = self.support.counts
+        enough = (dead > 0) & (dead >= np.asarray(min_support_dead)[:, None])
+        rare = alive <= np.asarray(max_support_alive)[:, None]
+        return enough[:, None, :] & rare[None, :, :]
+
+    def accuracy(self, mask):
+        """evaluate_accuracy() of the discriminative graph made of the edges in `mask`."""
+        key = np.packbits(mask).tobytes()
+        if key not in self._accuracy:
+            if self._index is None:
+                self._index = ContainmentIndex.from_corpus(
+                    self.corpus, np.concatenate([self.alive_groups, self.dead_groups]), self.support.directed)
+            # built exactly as _discriminative_graphs() does, so edge orientations match
+            disc_graph, _ = _empty(self.directed)
+            disc_graph.add_edges_from(self.support.edges(mask))
+            self._accuracy[key] = float(_score(self._index.contains([disc_graph]), len(self.alive_groups)))
+            instrument.count("accuracy_evaluations")
+        return self._accuracy[key]
+
+
+def sweep(corpus, alphas, betas, min_support_dead=(10,), max_support_alive=(2,), τ_values=(1, 2, 3),
+          phases=PHASES, fsm_ranking=None, directed=None, weighted=False):
+    """
+    Evaluate a full grid of DSM, harmful-edge and FSM thresholds from one
+    support count per phase (plus one FSM ranking) instead of one mining run
+    per setting.
+
+    Parameters:
+        corpus: Corpus — integer-encoded transition corpus
+        alphas, betas: iterables of float — find_discriminative_graph() thresholds
+        min_support_dead, max_support_alive: iterables of int — find_harmful_edges() thresholds
+        τ_values: iterable of int — fsm() thresholds (over every graph, as in the pipeline)
+        phases: phases to evaluate
+        fsm_ranking: SupportRanking — reused instead of recounting when given
+        directed, weighted: DSM and harmful-edge semantics, as in the Pipeline
+
+    Returns:
+        pd.DataFrame with one row per phase and grid point (see COLUMNS)
+    """
+    import pandas as pd
+
+    alphas, betas = list(alphas), list(betas)
+    min_support_dead, max_support_alive, τ_values = list(min_support_dead), list(max_support_alive), list(τ_values)
+    if fsm_ranking is None:
+        fsm_ranking = fsm_ranked_from_corpus(corpus)
+    frequent = {τ: fsm_ranking.count(τ) for τ in τ_values}
+
+    rows = []
+    for phase in phases:
+        with instrument.stage("sweep", phase=phase):
+            ps = PhaseSweep(corpus, corpus.select(phase=phase, mortality=0), corpus.select(phase=phase, mortality=1),
+                            directed, weighted)
+            disc, avoid = ps.discriminative(alphas, betas)
+            harmful = ps.harmful(min_support_dead, max_support_alive).sum(axis=2)
+            n_disc, n_avoid = ps.number_of_edges(disc), ps.number_of_edges(avoid)
+            accuracy = np.array([[ps.accuracy(disc[a, b]) for b in range(len(betas))] for a in range(len(alphas))])
+            instrument.count("grid_points", len(alphas) * len(betas) * harmful.size * len(τ_values))
+
+        for (a, alpha), (b, beta), (m, msd), (x, msa), τ in itertools.product(
+                enumerate(alphas), enumerate(betas), enumerate(min_support_dead), enumerate(max_support_alive), τ_values):
+            rows.append((phase, alpha, beta, msd, msa, τ, int(n_disc[a, b]), int(n_avoid[b]),
+                         int(harmful[m, x]), frequent[τ], accuracy[a, b]))
+    return pd.DataFrame(rows, columns=COLUMNS)
@@ -0,0 +1,168 @@
+from collections import namedtuple
+
+import numpy as np
+
+from sube import PathIndex
+
+# pattern: tuple of codes (2 codes for an edge); support1/support2: graphs of each class containing it
+ScoredPattern = namedtuple("ScoredPattern", ["pattern", "score", "support1", "support2"])
+
+
+def _xlogx(x):
+    x = np.asarray(x, dtype=float)
+    return np.where(x > 0, x * np.log2(np.where(x > 0, x, 1)), 0.0)
+
+
+def _entropy(a, b):
+    # entropy, in bits, of a two-way split of a + b items, weighted by a + b
+    n = a + b
+    return _xlogx(n) - _xlogx(a) - _xlogx(b)
+
+
+def information_gain(p, q, n1, n2):
+    """Information gain about the class from "graph contains the pattern"."""
+    p, q = np.asarray(p, dtype=float), np.asarray(q, dtype=float)
+    n = n1 + n2
+    return (_entropy(n1, n2) - _entropy(p, q) - _entropy(n1 - p, n2 - q)) / max(n, 1)
+
+
+def chi_square(p, q, n1, n2):
+    """Pearson χ² of the 2 x 2 table (class x contains pattern)."""
+    p, q = np.asarray(p, dtype=float), np.asarray(q, dtype=float)
+    n = n1 + n2
+    with_, without = p + q, n - p - q
+    denominator = with_ * without * n1 * n2
+    numerator = n * (p * (n2 - q) - q * (n1 - p)) ** 2
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+def log_odds_ratio(p, q, n1, n2):
+    """Absolute log odds ratio, with 0.5 added to every cell so empty cells stay finite."""
+    p, q = np.asarray(p, dtype=float), np.asarray(q, dtype=float)
+    return np.abs(np.log((p + 0.5) * (n2 - q + 0.5)) - np.log((q + 0.5) * (n1 - p + 0.5)))
+
+
+SCORES = {"ig": information_gain, "chi2": chi_square, "odds_ratio": log_odds_ratio}
+
+
+def upper_bound(score, p, q, n1, n2):
+    """
+    Best score any extension of a pattern with class supports (p, q) can reach.
+
+    Extending a path can only lower both supports, so an extension lies in the
+    rectangle [0, p] x [0, q]. IG and χ² are convex in (p, q) and the log odds
+    ratio is monotone in each, so the maximum over the rectangle is at one of
+    its corners. Returns the best of (p, q), (p, 0) and (0, q): at (0, 0) IG
+    and χ² are 0, and the log odds ratio is no larger than at (p, 0) or (0, q).
+    """
+    fn = SCORES[score]
+    zero = np.zeros_like(np.asarray(p, dtype=float))
+    return np.maximum.reduce([fn(p, q, n1, n2), fn(p, zero, n1, n2), fn(zero, q, n1, n2)])
+
+
+def _class_support(index, pattern_ids, ends, graph_class, n_patterns):
+    # graph-level support of every pattern in class 0 and class 1
+    pairs = np.unique(np.stack([pattern_ids, index.owner[ends]]), axis=1)
+    cls = graph_class[pairs[1]]
+    return (np.bincount(pairs[0][cls == 0], minlength=n_patterns),
+            np.bincount(pairs[0][cls == 1], minlength=n_patterns))
+
+
+def top_k(index, graph_class, k=10, score="chi2", max_length=3, min_support=1):
+    """
+    The k edges and path patterns (up to `max_length` codes) scoring highest at
+    separating class 0 from class 1 graphs of a PathIndex.
+
+    Patterns are grown level by level as in PathIndex.mine(). A pattern's
+    extensions are only explored while upper_bound() of its supports beats the
+    k-th best score found so far (branch and bound), and patterns in fewer than
+    `min_support` graphs are dropped with their extensions.
+
+    Parameters:
+        index: PathIndex — transitions of both classes
+        graph_class: np.ndarray — class (0, 1 or -1 to ignore) of every index graph id
+        k: int — number of patterns to return
+        score: str — "ig", "chi2" or "odds_ratio"
+        max_length: int — longest path, in codes (an edge is 2)
+        min_support: int — minimum number of graphs, over both classes, containing a pattern
+
+    Returns:
+        list of ScoredPattern, best first
+    """
+    fn = SCORES[score]
+    graph_class = np.asarray(graph_class, dtype=np.int64)
+    n1, n2 = int((graph_class == 0).sum()), int((graph_class == 1).sum())
+    n = index.n_codes
+
+    best_patterns, best_scores, best_support = [], np.zeros(0), np.zeros((2, 0), dtype=np.int64)
+    threshold = -np.inf
+
+    # level 2: every distinct edge, occurrence lists from the index
+    ends = index.positions
+    pattern_ids = np.searchsorted(index.edge_keys, index.keys[ends])
+    patterns = np.stack([index.edge_keys // n, index.edge_keys % n], axis=1)
+    n_patterns = len(index.edge_keys)
+
+    for length in range(2, max_length + 1):
+        if length > 2:
+            # join: pattern P followed by code c becomes candidate P + (c,)
+            nxt = ends + 1
+            ok = nxt < len(index.keys)
+            # the next transition must start where the pattern ends (edge lists need not be chains)
+            ok[ok] = (index.owner[nxt[ok]] == index.owner[ends[ok]]) & (index.keys[nxt[ok]] // n == index.dst[ends[ok]])
+            ends, pattern_ids = nxt[ok], pattern_ids[ok]
+            if len(ends) == 0:
+                break
+            candidates, pattern_ids = np.unique(pattern_ids * n + index.dst[ends], return_inverse=True)
+            patterns = np.hstack([patterns[candidates // n], (candidates % n)[:, None]])
+            n_patterns = len(candidates)
+
+        p, q = _class_support(index, pattern_ids, ends, graph_class, n_patterns)
+        frequent = p + q >= min_support
+        scores = fn(p, q, n1, n2)
+
+        # merge this level into the running top k
+        rows = np.flatnonzero(frequent)
+        best_patterns += [tuple(index.codes[path]) for path in patterns[rows]]
+        best_scores = np.concatenate([best_scores, scores[rows]])
+        best_support = np.hstack([best_support, np.stack([p[rows], q[rows]])])
+        if len(best_scores) > k:
+            keep = np.sort(np.argsort(-best_scores, kind="stable")[:k])
+            best_patterns = [best_patterns[i] for i in keep]
+            best_scores, best_support = best_scores[keep], best_support[:, keep]
+        if len(best_scores) == k:
+            threshold = best_scores.min()
+
+        # branch and bound: only patterns whose extensions may still enter the top k are grown
+        promising = frequent & (upper_bound(score, p, q, n1, n2) > threshold)
+        if not promising.any():
+            break
+        survives = promising[pattern_ids]
+        remap = np.cumsum(promising) - 1
+        ends, pattern_ids = ends[survives], remap[pattern_ids[survives]]
+        patterns = patterns[promising]
+
+    order = np.argsort(-best_scores, kind="stable")
+    return [ScoredPattern(best_patterns[i], float(best_scores[i]), int(best_support[0, i]), int(best_support[1, i]))
+            for i in order]
+
+
+def top_k_patterns(R_class1, R_class2, k=10, score="chi2", max_length=3, min_support=1):
+    """
+    Top-k discriminative edges and path patterns between two lists of graphs
+    (nx graphs or edge lists), scored by information gain, χ² or odds ratio.
+    Paths are runs of consecutive edges where each starts at the previous target.
+    """
+    index = PathIndex.from_edge_lists(list(R_class1) + list(R_class2))
+    graph_class = np.repeat([0, 1], [len(R_class1), len(R_class2)])
+    return top_k(index, graph_class, k, score, max_length, min_support)
+
+
+def top_k_patterns_from_corpus(corpus, class1_groups, class2_groups, k=10, score="chi2", max_length=3, min_support=1):
+    class1_groups = corpus.group_ids(class1_groups)
+    class2_groups = corpus.group_ids(class2_groups)
+    graph_class = np.full(len(corpus), -1, dtype=np.int64)
+    graph_class[class1_groups] = 0
+    graph_class[class2_groups] = 1
+    index = PathIndex.from_corpus(corpus, np.concatenate([class1_groups, class2_groups]))
+    return top_k(index, graph_class, k, score, max_length, min_support)
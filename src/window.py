@@ -0,0 +1,158 @@
+from collections import namedtuple
+
+import numpy as np
+import networkx as nx
+
+from corpus import edge_keys
+from incremental import IncrementalDSM
+
+# one window position: admissions [start, stop) of the admission order and its mining results
+WindowStep = namedtuple("WindowStep", ["start", "stop", "frequent", "discriminative", "avoid", "changes"])
+
+
+class SlidingWindow:
+    """
+    FSM and DSM over a sliding window of admissions instead of the whole table.
+
+    Admissions (hadm_id) are ordered by `order` (hadm_id itself by default, or
+    e.g. an admission timestamp once one is joined in). Moving the window adds
+    the transitions of the admissions entering it and expires those of the
+    admissions leaving it, so each transition is counted in and out once:
+    the occurrence counts behind fsm() and the alive/dead graph support behind
+    find_discriminative_graph() are updated in O(1) per transition, and each
+    step only re-evaluates the edges those updates touched (see IncrementalDSM).
+
+    Parameters:
+        corpus: Corpus — integer-encoded transition corpus
+        τ: int — FSM occurrence threshold inside the window
+        alpha, beta: float — DSM thresholds inside the window
+        phase: str — only mine groups of this phase (None for all phases)
+        order: dict hadm_id -> sortable key, admission order (default: hadm_id)
+    """
+
+    def __init__(self, corpus, τ=2, alpha=0.005, beta=0.5, phase=None, order=None):
+        self.corpus = corpus
+        self.τ = τ
+        groups = corpus.select(phase=phase)
+        hadm = corpus.hadm_id[groups]
+        if order is None:
+            rank = hadm
+        else:
+            rank = np.array([order[h] for h in hadm.tolist()])
+        sorted_groups = np.lexsort((groups, hadm, rank))
+        self.groups = groups[sorted_groups]
+        rank, hadm = rank[sorted_groups], hadm[sorted_groups]
+
+        # admission a holds groups[admission_offsets[a]:admission_offsets[a + 1]]
+        first = np.ones(len(self.groups), dtype=bool)
+        first[1:] = hadm[1:] != hadm[:-1]
+        starts = np.flatnonzero(first)
+        self.admissions = hadm[starts]
+        self.admission_rank = rank[starts]
+        self.admission_offsets = np.append(starts, len(self.groups))
+
+        self.occurrences = {}   # edge key -> transitions inside the window
+        self.frequent = set()   # edge keys with >= τ occurrences
+        self.dsm = IncrementalDSM(alpha, beta)
+        self.start = self.stop = 0
+
+    def __len__(self):
+        return len(self.admissions)
+
+    def _groups_of(self, a):
+        return self.groups[self.admission_offsets[a]:self.admission_offsets[a + 1]]
+
+    def _transitions(self, g):
+        lo, hi = self.corpus.offsets[g], self.corpus.offsets[g + 1]
+        return edge_keys(self.corpus.src[lo:hi], self.corpus.dst[lo:hi], self.corpus.n_codes).tolist()
+
+    def _count(self, keys, delta):
+        for key in keys:
+            before = self.occurrences.get(key, 0)
+            after = before + delta
+            if after:
+                self.occurrences[key] = after
+            else:
+                del self.occurrences[key]
+            if before < self.τ <= after:
+                self.frequent.add(key)
+            elif after < self.τ <= before:
+                self.frequent.discard(key)
+
+    def _enter(self, a):
+        for g in self._groups_of(a).tolist():
+            keys = self._transitions(g)
+            self._count(keys, 1)
+            if self.corpus.mortality[g] in (0, 1):
+                self.dsm.add(g, keys, int(self.corpus.mortality[g]))
+
+    def _expire(self, a):
+        for g in self._groups_of(a).tolist():
+            self._count(self._transitions(g), -1)
+            if g in self.dsm.patients:
+                self.dsm.remove(g)
+
+    def move(self, start, stop):
+        """
+        Slide the window to admissions [start, stop) of the admission order.
+        Both bounds may only move forward.
+        """
+        if start < self.start or stop < self.stop or stop < start:
+            raise ValueError("the window only slides forward")
+        # admissions jumped over entirely are neither entered nor expired
+        for a in range(self.start, min(start, self.stop)):
+            self._expire(a)
+        for a in range(max(self.stop, start), stop):
+            self._enter(a)
+        self.start, self.stop = start, stop
+        return self._step()
+
+    def _decode(self, keys):
+        return self.corpus.decode_keys(np.fromiter(keys, dtype=np.int64, count=len(keys)))
+
+    def _step(self):
+        changes = self.dsm.refresh()
+        discriminative = nx.Graph()
+        discriminative.add_edges_from(self._decode(self.dsm.result["discriminative"]))
+        avoid = nx.Graph()
+        avoid.add_edges_from(self._decode(self.dsm.result["avoid"]))
+        changes = {kind: (self._decode(c.added), self._decode(c.removed))
+                   for kind, c in changes.items() if kind != "harmful"}
+        return WindowStep(self.start, self.stop, set(self._decode(self.frequent)), discriminative, avoid, changes)
+
+    def last(self, size, step=1):
+        """Yield one WindowStep for every position of a window of the last `size` admissions."""
+        if step <= 0:
+            raise ValueError("step must be positive")
+        return self._last(size, step)
+
+    def _last(self, size, step):
+        for stop in range(min(size, len(self)), len(self) + 1, step):
+            yield self.move(max(0, stop - size), stop)
+
+    def span(self, width, step):
+        """
+        Yield one WindowStep per time range [t - width, t), t advancing by
+        `step` in units of the admission order key (e.g. timestamps).
+        """
+        if width <= 0 or step <= 0:
+            raise ValueError("width and step must be positive")
+        return self._span(width, step)
+
+    def _span(self, width, step):
+        if len(self) == 0:
+            return
+        rank = self.admission_rank
+        t = rank[0] + width
+        while True:
+            start = int(np.searchsorted(rank, t - width, side="left"))
+            stop = int(np.searchsorted(rank, t, side="left"))
+            yield self.move(start, stop)
+            if stop >= len(self):
+                return
+            t = t + step
+
+
+def sliding_windows(corpus, size, step=1, τ=2, alpha=0.005, beta=0.5, phase=None, order=None):
+    """Frequent and discriminative edges of every window of `size` consecutive admissions."""
+    return SlidingWindow(corpus, τ, alpha, beta, phase, order).last(size, step)